@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# Runs experiments without the menu, from a JSON or TOML spec:
+#
+#   experiment = "Threshold"      # any SimulationObject of simulation.py
+#   graph_type = "random"         # or "scale-free"
+#   tests = 30
+#   iterations = 100
+#   workers = 0                   # 0 - one per core
+#   output = "results/threshold"  # plots and their data (json), drawn in the background
+#   formats = ["png", "svg"]      # of the plots, png by default
+#   seed = 7                      # graphs and companies' places, random if missing
+#   store = "results/threshold/store"  # tests' results on disk (results.py), output/store
+#                                 # by default; a named store is reused, running the same seeded
+#                                 # spec again replots from it
+#   checkpoint_every = 1000       # ticks between checkpoints of each test (tick engine),
+#                                 # output/<point>-<test>.ckpt; none by default
+#
+#   [simulation]                  # Simulation arguments
+#   n_nodes = 50
+#   graph_backend = "csr"         # or "networkx", see graph_backend.py
+#   demand = "aggregate"          # or "clients", see demand.py
+#   clients_per_node = 100        # clients each node stands for, aggregated demand only
+#   seed = 1
+#   engine = "event"              # or "tick", see events.py
+#   max_pending = 50              # offers a company may have waiting for a truck (50)
+#   offer_ttl = 20                # ticks a won offer may wait for one (20)
+#   profile = "results/phases.jsonl"  # time of each phase of each run, see timing.py
+#   metrics = "results/metrics"   # counters of each run (.jsonl), summed per parameters (.prom), see metrics.py
+#
+# usage: python batch.py [--resume] [--store path] spec.toml [spec.json ...]
+#
+# --resume goes on with runs that were stopped: the random state each run
+# started with is kept in output/resume.pkl, with it the sweep points come out
+# the same and the tests already in the store are not run again. Without it
+# the default store starts empty, stored tests are only taken from a store
+# named by the spec or by --store (for every spec). With checkpoint_every the
+# tests stopped halfway go on from their last checkpoint, without --resume
+# the checkpoints left are deleted
+import argparse
+import glob
+import json
+import os
+import pickle
+import random
+import sys
+import metrics
+import simulation
+from results import ResultStore
+
+def load_spec(path):
+	if path.endswith(".toml"):
+		import tomllib
+		with open(path, "rb") as f:
+			spec = tomllib.load(f)
+	else:
+		with open(path) as f:
+			spec = json.load(f)
+	experiment = getattr(simulation, spec.get("experiment", ""), None)
+	if not (isinstance(experiment, type) and issubclass(experiment, simulation.SimulationObject)):
+		raise ValueError(f"{path}: unknown experiment {spec.get('experiment')!r}")
+	if "output" not in spec:
+		raise ValueError(f"{path}: missing output folder")
+	return spec
+
+def run_spec(spec, resume=False, store=None):
+	simulation.graphType = spec.get("graph_type", "random")
+	simulation.tests = spec.get("tests", 30)
+	simulation.iterations = spec.get("iterations", 100)
+	simulation.workers = spec.get("workers", 1)
+	simulation.verbosity = spec.get("verbose", False)
+	simulation.graph_utils.colormap = []
+	simulation.render.formats = spec.get("formats", ["png"])
+	store = store or spec.get("store")
+	simulation.store = ResultStore(store or os.path.join(spec["output"], "store"))
+	if not (resume or store):
+		simulation.store.clear()
+	if "seed" in spec:
+		random.seed(spec["seed"])
+	os.makedirs(spec["output"], exist_ok=True)
+	simulation.checkpoints = spec["output"] if spec.get("checkpoint_every") else None
+	simulation.checkpointEvery = spec.get("checkpoint_every", 1000)
+	if not resume:
+		for path in glob.glob(os.path.join(spec["output"], "*.ckpt")):
+			os.remove(path)
+	state = os.path.join(spec["output"], "resume.pkl")
+	if resume and os.path.exists(state):
+		with open(state, "rb") as f:
+			random.setstate(pickle.load(f))
+	else:
+		with open(state, "wb") as f:
+			pickle.dump(random.getstate(), f)
+
+	experiment = getattr(simulation, spec["experiment"])(simulation.graphType)
+	experiment.params = spec.get("simulation", dict())
+	experiment.output = spec["output"]
+	with open(os.path.join(experiment.output, "spec.json"), "w") as f:
+		json.dump(spec, f, indent=1)
+	experiment.run()
+	if "metrics" in experiment.params:
+		metrics.write(experiment.params["metrics"])
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Run experiments headless from spec files")
+	parser.add_argument("specs", nargs="+", help="experiment specs (.json or .toml)")
+	parser.add_argument("--resume", action="store_true", help="go on with the specs' last runs instead of starting new ones")
+	parser.add_argument("--store", help="results store of every spec, the tests already in it are not run again")
+	args = parser.parse_args(argv)
+
+	specs = [load_spec(path) for path in args.specs]
+	for path, spec in zip(args.specs, specs):
+		print(f"{path}: {spec['experiment']} -> {spec['output']}", flush=True)
+		run_spec(spec, args.resume, args.store)
+
+if __name__ == '__main__':
+	main()
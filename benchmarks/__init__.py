@@ -0,0 +1 @@
+# micro-benchmarks of the simulation hot paths, see __main__.py
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+# Times the simulation hot paths on a grid of worlds and compares runs:
+#
+#   python -m benchmarks run -o baseline.json
+#   python -m benchmarks run -o current.json --nodes 50 200 --trucks 7 30
+#   python -m benchmarks compare baseline.json current.json --threshold 0.1
+#
+# compare exits with status 1 when a benchmark got slower than the threshold
+import argparse
+import gc
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+from benchmarks.fixtures import fixtures, World
+from benchmarks.hotpaths import BENCHMARKS
+
+def timeOnce(bench, world):
+	world.reset()
+	run, ops = bench(world)
+	gc.disable()
+	start = time.perf_counter()
+	run()
+	elapsed = time.perf_counter() - start
+	gc.enable()
+	return (elapsed, ops)
+
+def measure(bench, world, repeat, min_time=0.02):
+	# each sample runs the benchmark as many times as it takes to last
+	# min_time, short ones are too noisy otherwise
+	elapsed, ops = timeOnce(bench, world)
+	loops = max(1, math.ceil(min_time/max(elapsed, 1e-9)))
+	times = []
+	for _ in range(repeat):
+		times.append(sum(timeOnce(bench, world)[0] for _ in range(loops))/loops)
+	return dict(ops=ops, repeat=repeat, loops=loops, min=min(times), median=statistics.median(times), per_op=min(times)/ops)
+
+def commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+	except OSError:
+		return None
+
+def run(args):
+	params = fixtures(args.graph_type, args.nodes, args.companies, args.trucks, args.risk, args.backend)
+	names = args.bench or list(BENCHMARKS)
+	results = dict()
+	for fixture, p in params.items():
+		world = World(p, seed=args.seed)
+		for name in names:
+			result = measure(BENCHMARKS[name], world, args.repeat)
+			results[f"{fixture}/{name}"] = result
+			print(f"{fixture:36} {name:14} {result['per_op']*1e6:12.1f} us/op", flush=True)
+	meta = dict(commit=commit(), time=time.strftime("%Y-%m-%dT%H:%M:%S"), python=platform.python_version(),
+		platform=platform.platform(), numpy=np.__version__, seed=args.seed, repeat=args.repeat)
+	with open(args.output, "w") as f:
+		json.dump(dict(meta=meta, fixtures=params, results=results), f, indent=1)
+
+def compare(args):
+	with open(args.baseline) as f:
+		baseline = json.load(f)["results"]
+	with open(args.current) as f:
+		current = json.load(f)["results"]
+	regressions = []
+	for key in sorted(set(baseline) | set(current)):
+		if key not in baseline or key not in current:
+			print(f"{key:52} {'only in ' + ('current' if key in current else 'baseline'):>24}")
+			continue
+		ratio = current[key]["per_op"]/baseline[key]["per_op"]
+		if ratio > 1 + args.threshold:
+			status = "SLOWER"
+			regressions.append(key)
+		elif ratio < 1/(1 + args.threshold):
+			status = "faster"
+		else:
+			status = ""
+		print(f"{key:52} {baseline[key]['per_op']*1e6:10.1f} {current[key]['per_op']*1e6:10.1f} us/op {ratio:6.2f}x {status}")
+	print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+	return 1 if regressions else 0
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Simulation hot path benchmarks")
+	commands = parser.add_subparsers(dest="command", required=True)
+	r = commands.add_parser("run", help="time the benchmarks and save them as json")
+	r.add_argument("-o", "--output", default="benchmarks.json")
+	r.add_argument("--bench", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (all by default)")
+	r.add_argument("--graph-type", nargs="+", default=["random", "scale-free"], choices=["random", "scale-free"])
+	r.add_argument("--nodes", nargs="+", type=int, default=[15, 100])
+	r.add_argument("--companies", nargs="+", type=int, default=[5])
+	r.add_argument("--trucks", nargs="+", type=int, default=[7])
+	r.add_argument("--risk", nargs="+", type=float, default=[0.3], help="offer density, chance of a client ordering each tick")
+	r.add_argument("--backend", nargs="+", default=["networkx"], choices=["networkx", "csr"], help="graph backend")
+	r.add_argument("--repeat", type=int, default=9)
+	r.add_argument("--seed", type=int, default=0)
+	c = commands.add_parser("compare", help="compare two saved runs")
+	c.add_argument("baseline")
+	c.add_argument("current")
+	c.add_argument("--threshold", type=float, default=0.1, help="slowdown flagged as a regression (0.1 - 10%%)")
+	args = parser.parse_args(argv)
+	if args.command == "run":
+		run(args)
+		return 0
+	return compare(args)
+
+if __name__ == '__main__':
+	sys.exit(main())
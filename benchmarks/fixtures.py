@@ -0,0 +1,40 @@
+#!/usr/bin/python
+import itertools
+import random
+from simulation import Simulation
+from distance_oracle import DistanceOracle
+
+def fixtures(graph_types=("random", "scale-free"), nodes=(15, 100), companies=(5,), trucks=(7,), risks=(0.3,), backends=("networkx",)):
+	# Simulation arguments of every combination, by name
+	params = dict()
+	for graph_type, n_nodes, n_companies, n_trucks, risk, backend in itertools.product(graph_types, nodes, companies, trucks, risks, backends):
+		name = f"{graph_type}-n{n_nodes}-c{n_companies}-t{n_trucks}-r{risk}" + ("" if backend == "networkx" else "-" + backend)
+		params[name] = dict(graph_type=graph_type, graph_param=0.2 if graph_type == "random" else 2,
+			n_nodes=n_nodes, n_companies=n_companies, n_trucks=n_trucks, risk=risk, graph_backend=backend)
+	return params
+
+class World(object):
+	# a simulation ready to run and a snapshot of it, benchmarks go back to the
+	# snapshot (and to the same random state) before every repeat
+	def __init__(self, params, seed=0):
+		self.seed = seed
+		random.seed(seed)
+		self.sim = Simulation(seed=seed, **params)
+		self.graph = self.sim.build_graph()
+		self.companies = self.sim.generate_companies(self.graph, True)
+		self.sim.generate_trucks(self.graph, self.companies)
+		self.clients = self.sim.generate_clients(self.graph, self.companies)
+		self.oracle = DistanceOracle(self.graph)
+		self.state = self.sim.snapshot(self.companies, self.oracle.getState())
+		self.reset()
+
+	def __repr__(self):
+		return f"World with {self.graph.number_of_nodes()} nodes, {len(self.companies)} companies and {len(self.clients)} clients"
+
+	def reset(self):
+		self.companies = self.sim.restore(self.state, self.graph, self.oracle, self.clients)
+		self.sim.oracle = self.oracle
+		self.sim.engine = "tick"
+		for c in self.companies:
+			c[1].setOracle(self.oracle)
+		random.seed(self.seed)
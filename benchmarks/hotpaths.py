@@ -0,0 +1,94 @@
+#!/usr/bin/python
+import random
+import numpy as np
+from distance_oracle import DistanceOracle
+from events import Arrivals
+from offer import Offer
+
+# every benchmark takes a World (just reset) and returns (run, ops): run does
+# ops operations of the hot path and is the only part that is timed
+
+def sample_offers(world, n):
+	offers = []
+	for cli in random.choices(world.clients, k=n):
+		offer = Offer(cli.pos, random.randint(cli.min_offer_val, cli.max_offer_val), 0)
+		offer.setValue(offer.getQuantity())
+		offers.append(offer)
+	return offers
+
+def oracle_build(world):
+	return (lambda: DistanceOracle(world.graph), 1)
+
+def oracle_repair(world):
+	def run():
+		for t in range(10):
+			world.sim.do_edge_explosion(t, world.graph)
+	return (run, 10)
+
+def truck_price(world):
+	# a truck with a few stops already planned
+	truck = world.companies[0][1].trucks[0]
+	for offer in sample_offers(world, 4):
+		truck.addItem(offer)
+	offers = sample_offers(world, 200)
+	def run():
+		for offer in offers:
+			truck.getPrice(offer)
+	return (run, len(offers))
+
+def company_bid(world):
+	company = world.companies[0][1]
+	offers = sample_offers(world, 200)
+	def run():
+		for offer in offers:
+			company.getBid(offer)
+	return (run, len(offers))
+
+def company_bids(world):
+	company = world.companies[0][1]
+	offers = sample_offers(world, 200)
+	targets = np.array([o.getTarget() for o in offers])
+	quantities = np.array([o.getQuantity() for o in offers])
+	return (lambda: company.getBids(targets, quantities), len(offers))
+
+def client_go(world):
+	def run():
+		for t in range(10):
+			for cli in world.clients:
+				cli.go(t)
+	return (run, 10*len(world.clients))
+
+def clear_market(world, arrivals, t):
+	# the offers of tick t as Simulation.runTicks takes them, explosions left out
+	edge, truck, firing = arrivals.pop(t)
+	if firing != []:
+		bidders = [world.clients[k] for k in firing]
+		world.sim.awardOffers([cli.makeOffer(t) for cli in bidders], bidders, world.companies)
+
+def market(world):
+	arrivals = Arrivals(world.sim, world.clients, 10)
+	def run():
+		for t in range(10):
+			clear_market(world, arrivals, t)
+	return (run, 10)
+
+def company_go(world):
+	# companies with a backlog of offers from a few market ticks
+	arrivals = Arrivals(world.sim, world.clients, 5)
+	for t in range(5):
+		clear_market(world, arrivals, t)
+	def run():
+		for t in range(5, 15):
+			for c in world.companies:
+				c[1].go(world.graph, t)
+	return (run, 10*len(world.companies))
+
+def run_tick(world, iterations=100):
+	return (lambda: world.sim.run(world.graph, world.companies, world.clients, iterations, world.oracle), iterations)
+
+def run_event(world, iterations=100):
+	world.sim.engine = "event"
+	return run_tick(world, iterations)
+
+BENCHMARKS = dict((f.__name__, f) for f in [oracle_build, oracle_repair, truck_price, company_bid, company_bids,
+	client_go, market, company_go, run_tick, run_event])
@@ -0,0 +1,34 @@
+#!/usr/bin/python
+import os
+import pickle
+
+class Checkpoint(object):
+	# the state of a long run, saved every `every` ticks to one file so that a
+	# run that was stopped can go on from its last checkpoint (Simulation.run);
+	# the file is replaced atomically, a crash while saving keeps the previous one
+	def __init__(self, path, every=1000):
+		self.path = path
+		self.every = every
+
+	def __repr__(self):
+		return f"Checkpoint at {self.path} every {self.every} ticks"
+
+	def due(self, i):
+		return (i+1) % self.every == 0
+
+	def save(self, state):
+		tmp = f"{self.path}.{os.getpid()}"
+		with open(tmp, "wb") as f:
+			pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp, self.path)
+
+	def load(self):
+		# the saved state, None if there is none
+		if not os.path.exists(self.path):
+			return None
+		with open(self.path, "rb") as f:
+			return pickle.load(f)
+
+	def clear(self):
+		if os.path.exists(self.path):
+			os.remove(self.path)
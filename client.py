@@ -1,11 +1,11 @@
 #!/usr/bin/python
-from company import *
 from offer import *
 import math
 import numpy as np
 from random import *
 import copy
 import warnings
+import metrics
 
 class Client:
 	def __init__(self, pos, companies, risk=(randint(1,99)/100), utilities=[], min_offer_val=20, max_offer_val=100):
@@ -26,7 +26,10 @@ class Client:
 		self.utilities = utilities
 		
 	def generate_offer(self, i):
-		return Offer(self.pos, randint(self.min_offer_val, self.max_offer_val), i) if (randint(1,99)/100) < self.risk else None
+		return self.makeOffer(i) if (randint(1,99)/100) < self.risk else None
+
+	def makeOffer(self, i):
+		return Offer(self.pos, randint(self.min_offer_val, self.max_offer_val), i)
 
 	def chooseBestBid(self, bids):
 		with warnings.catch_warnings():
@@ -47,11 +50,15 @@ class Client:
 		offer = self.generate_offer(i);
 		if offer != None:
 			offers = [c.getBid(offer) for c in self.companies]
+			metrics.counters["offers_generated"] += 1
+			metrics.counters["bids_requested"] += len(offers)
+			metrics.counters["bids_inf"] += offers.count(math.inf)
 			company = self.chooseBestBid(offers)
 			if company == None:
 				return
 			# print("Client ", self.pos, " requesting offer from ", self.companies[company].pos, "  ",offers[company].getValue(),"  ", self.companies)
 			if offers[company] != math.inf:
+				metrics.counters["offers_awarded"] += 1
 				offer.setValue(offers[company])
 				self.companies[company].setOffer(offer)
 				# print("Client ", self.pos, " requesting offer from ", self.companies[company].pos, "    ", self.companies)
\ No newline at end of file
@@ -1,17 +1,22 @@
 #!/usr/bin/python
-from truck import *
 from offer import *
+from fleet import TruckFleet
+import copy
 import math
+import numpy as np
+import metrics
 from random import *
 
 class Company:
-	def __init__(self, pos, money, name, g, uni_cost=1, truck_threshold=280, profit_margin=1.5, tax=0.05):
+	def __init__(self, pos, money, name, g, uni_cost=1, truck_threshold=280, profit_margin=1.5, tax=0.05, max_pending=50, offer_ttl=20):
 		self.pos = pos
 		self.money = money
 		self.name = name
-		self.offers = []
+		self.offers = OfferQueue(max_pending, offer_ttl)
 		self.trucks = []
+		self.fleet = TruckFleet(0, pos)
 		self.graph = g
+		self.oracle = None
 		self.uniCost = uni_cost
 		self.truck_threshold = truck_threshold
 		self.profit_margin = profit_margin
@@ -23,49 +28,45 @@ class Company:
 
 	def setTrucks(self, trucks):
 		self.trucks = trucks
+		self.fleet = TruckFleet(len(trucks), self.pos)
+		self.fleet.setOracle(self.oracle)
+		for slot, t in enumerate(self.trucks):
+			self.fleet.bind(slot, t)
+			t.updateOracle(self.oracle)
+
+	def setOracle(self, oracle):
+		self.oracle = oracle
+		self.fleet.setOracle(oracle)
+		for t in self.trucks:
+			t.updateOracle(oracle)
 
 	def getBestPrice(self, item):
-		free_trucks = [t for t in self.trucks if t.getStatus() == "livre"]
-		if free_trucks == []:
-			return False
-		else:
-			costs = [t.getPrice(item) for t in free_trucks]
-			# print(costs)
-			minimum = min(costs)
-		return minimum
+		# inf when no free truck can take the item
+		return self.fleet.quote(item.getTarget(), item.getQuantity())[0]
 
 	def chooseTruck(self, item):
-		free_trucks = [t for t in self.trucks if t.getStatus() == "livre"]
-		if free_trucks == []:
-			return False
-		else:
-			costs = [t.getPrice(item) for t in free_trucks]
-			minimum = min(costs)
+		minimum, slot = self.fleet.quote(item.getTarget(), item.getQuantity())
 
 		if minimum == math.inf:
 			return False
 
-		truck = free_trucks[costs.index(minimum)]
-		truck.addItem(item)
+		self.trucks[slot].addItem(item)
 		return True
 
 	def updateTrucks(self):
-		free_trucks = [t for t in self.trucks if t.getStatus() == "livre"]
-		for t in free_trucks:
-			if t.getCapacity() < self.truck_threshold: # muito baixo trucks não vão distribuir
-				t.setStatus("ocupado")
+		return self.fleet.dispatchFull(self.truck_threshold) # muito baixo trucks não vão distribuir
 
 	def receiveMoney(self, value, truck):
 		self.money += value
 		truck.setStatus("livre")
 
 	def truckExplosion(self):
-		truck = choice(self.trucks)
-		self.trucks.remove(truck)
+		slot = choice(np.flatnonzero(self.fleet.alive))
+		self.fleet.explode(slot)
 		# vai-se subtrair o custo do caminho feito até agora
 		
 	def getBid(self, offer):
-		if self.money <=0:
+		if self.money <=0 or self.offers.full():
 			return math.inf
 
 		minimum = self.getBestPrice(offer)
@@ -77,10 +78,37 @@ class Company:
 	
 		return val*self.tax + val if self.money >= val*self.tax else math.inf
 
+	def getBids(self, targets, quantities):
+		# getBid for many offers at once, given their targets and quantities
+		if self.money <=0 or self.offers.full():
+			return np.full(len(targets), math.inf)
+
+		minimum = self.fleet.quoteMany(targets, quantities)
+		val = (quantities*self.uniCost+minimum)*self.profit_margin
+
+		return np.where(self.money >= val*self.tax, val*self.tax + val, math.inf)
+
 	def setOffer(self, offer):
-		self.offers.append(offer)
+		self.offers.push(offer)
 		self.money -= self.tax*offer.getValue()
 
+	def setOffers(self, offers, value):
+		# setOffer for many offers whose values add up to value
+		for o in offers:
+			self.offers.push(o)
+		self.money -= self.tax*value
+
+	def getState(self):
+		# what a run changes: money, pending offers and the trucks
+		return (self.money, self.completedOffers, [copy.copy(o) for o in self.offers], self.fleet.getState())
+
+	def setState(self, state):
+		self.money, self.completedOffers, offers, fleet = state
+		self.offers = OfferQueue(self.offers.max_pending, self.offers.ttl)
+		for o in offers:
+			self.offers.push(copy.copy(o))
+		self.fleet.setState(fleet)
+
 	def setUniCost(self, uniCost):
 		self.uniCost = uniCost
 	
@@ -97,14 +125,23 @@ class Company:
 		# print(f"{self} -- {self.offers}")
 		self.graph = g
 		
-		for t in self.trucks:
-			t.go(g)
-
-		for o in self.offers:
-			success = self.chooseTruck(o)
-			if success:
-				self.offers.remove(o)
-				self.completedOffers += 1
+		for slot in self.fleet.busy():
+			self.trucks[slot].go(g)
 
+		self.assignOffers(i)
 		self.updateTrucks()
 
+	def assignOffers(self, i):
+		# oldest offers first, until no truck is free
+		self.offers.expire(i)
+		assigned = []
+		for key, o in self.offers.items():
+			if not self.fleet.free.any():
+				break
+			if self.chooseTruck(o):
+				assigned.append(key)
+				self.completedOffers += 1
+		for key in assigned:
+			self.offers.remove(key)
+		metrics.counters["offers_dispatched"] += len(assigned)
+
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+import numpy as np
+from random import getrandbits
+from offer import Offer
+from events import tick_probability
+
+class Demand(object):
+	# every client node at once, instead of a Client object per node: risks are
+	# an array and utilities a nodes x companies matrix, each tick's offers are
+	# drawn for all nodes in one batch and a bankrupt company is a column
+	# switched off in a mask. Simulation(demand="aggregate") uses it in place of
+	# the list of clients. A node may stand for many clients alike (clients per
+	# node, a number or one per node), its offers of a tick are then a binomial draw
+	def __init__(self, nodes, companies, risk, utilities, clients=1, min_offer_val=20, max_offer_val=100):
+		self.nodes = np.asarray(nodes, dtype=np.int64)
+		self.companies = list(companies) # the columns of utilities
+		self.column = dict((c, j) for j, c in enumerate(self.companies))
+		self.alive = np.ones(len(self.companies), dtype=bool)
+		self.risk = np.full(len(self.nodes), risk, dtype=float)
+		self.utilities = np.array(utilities, dtype=float).reshape(len(self.nodes), len(self.companies))
+		self.clients = np.broadcast_to(np.asarray(clients, dtype=np.int64), len(self.nodes)).copy()
+		self.min_offer_val = min_offer_val
+		self.max_offer_val = max_offer_val
+		self.rng = None
+
+	def __repr__(self):
+		return f"Demand of {int(self.clients.sum())} clients on {len(self.nodes)} nodes for {int(self.alive.sum())} companies"
+
+	def __len__(self):
+		return len(self.nodes)
+
+	def setUtilities(self, utilities):
+		# utilities of every node, a row (one per company) or the whole matrix
+		self.utilities[:] = utilities
+
+	def setCompanies(self, companies):
+		self.alive[:] = False
+		for c in companies:
+			self.alive[self.column[c]] = True
+
+	def removeCompany(self, company):
+		self.alive[self.column[company]] = False
+
+	def reset(self):
+		# at the start of a run: the draws come from a generator seeded by the
+		# run's random state, so tests stay reproducible; per tick probabilities
+		# are the ones of Client.generate_offer
+		self.rng = np.random.default_rng(getrandbits(64))
+		risks, inverse = np.unique(self.risk, return_inverse=True)
+		self.p = np.array([tick_probability(float(r)) for r in risks])[inverse]
+		self.uniform = len(risks) == 1
+		self.single = bool((self.clients == 1).all())
+
+	def draw(self, t):
+		# (offers, rows) of tick t, rows in node order, a node once per offer;
+		# with a client per node and a single risk the number of offers is drawn
+		# first and then which nodes make them, so a tick costs the offers it
+		# makes, not the nodes
+		if not self.single:
+			rows = np.repeat(np.arange(len(self.p)), self.rng.binomial(self.clients, self.p))
+		elif self.uniform:
+			k = self.rng.binomial(len(self.p), self.p[0])
+			rows = np.sort(self.rng.choice(len(self.p), size=k, replace=False))
+		else:
+			rows = np.flatnonzero(self.rng.random(len(self.p)) < self.p)
+		quantities = self.rng.integers(self.min_offer_val, self.max_offer_val, size=len(rows), endpoint=True)
+		offers = [Offer(n, q, t) for n, q in zip(self.nodes[rows].tolist(), quantities.tolist())]
+		return (offers, rows)
+
+	def utilitiesOf(self, rows):
+		# rows x companies still in business, in the order of the companies list
+		return self.utilities[rows][:, self.alive]
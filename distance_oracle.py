@@ -0,0 +1,225 @@
+#!/usr/bin/python
+import heapq
+import math
+from collections import OrderedDict
+import numpy as np
+import metrics
+from graph_backend import CSRGraph, sparse
+
+# bytes of rows a lazy oracle keeps, and the size from which a CSRGraph's oracle is lazy
+ROW_BYTES = 2**28
+
+class Rows(object):
+	# dist or pred of a lazy oracle, read like the dense tables: [u], [u, v],
+	# [sources] and [sources, targets] pairwise
+	def __init__(self, oracle, table):
+		self.oracle = oracle
+		self.table = table # 0 - dist, 1 - pred
+
+	def __len__(self):
+		return self.oracle.n
+
+	def __getitem__(self, key):
+		sources, targets = key if isinstance(key, tuple) else (key, slice(None))
+		if np.ndim(sources) == 0:
+			return self.oracle.row(int(sources))[self.table][targets]
+		rows = np.array([self.oracle.row(s)[self.table] for s in np.asarray(sources).tolist()]).reshape(-1, self.oracle.n)
+		if isinstance(targets, slice):
+			return rows[:, targets]
+		return rows[np.arange(len(rows)), targets]
+
+class DistanceOracle(object):
+	# weighted all-pairs distances and predecessors of a road network
+	# nodes are expected to be labelled 0..n-1 (as graph_utils generates them).
+	# Over a CSRGraph whose n x n tables would take more than ROW_BYTES the
+	# oracle is lazy: a row is computed when it is first read and the last
+	# ones read are kept
+	def __init__(self, graph, build=True):
+		self.graph = graph
+		self.n = n = graph.number_of_nodes()
+		self.lazy = hasattr(graph, "has_csgraph") and 16*n*n > ROW_BYTES
+		if self.lazy:
+			self.rows = OrderedDict() # source -> (dist, pred) rows, least recently read first
+			self.limit = min(n, max(16, ROW_BYTES // (16*max(n, 1))))
+			self.dist = Rows(self, 0)
+			self.pred = Rows(self, 1)
+		else:
+			self.dist = np.full((n, n), math.inf)
+			self.pred = np.full((n, n), -1, dtype=np.int64)
+		self.version = 0 # bumped whenever the tables change
+		# rows recomputed by each repair since version base, see changedSince
+		self.base = 0
+		self.repairs = []
+		if build:
+			self.rebuild()
+
+	def __repr__(self):
+		return f"DistanceOracle over {self.n} nodes" + (f", {len(self.rows)} rows kept" if self.lazy else "")
+
+	def __getstate__(self):
+		# the rows a lazy oracle kept are not pickled, they are computed again
+		state = dict(self.__dict__)
+		if self.lazy:
+			state["rows"] = OrderedDict()
+		return state
+
+	def getState(self):
+		# a lazy oracle only needs its version, its rows follow the graph
+		if self.lazy:
+			return (None, None, self.version)
+		return (self.dist.copy(), self.pred.copy(), self.version)
+
+	def setState(self, state):
+		# back to the tables of a snapshot; the version still moves forward so
+		# that nothing synced in between is taken as current
+		dist, pred, version = state
+		if self.version != version:
+			if self.lazy:
+				self.rows.clear()
+			else:
+				self.dist[:] = dist
+				self.pred[:] = pred
+			self.version += 1
+			self.forget()
+
+	def rebuild(self):
+		self.version += 1
+		self.forget()
+		if self.lazy:
+			self.rows.clear()
+			return
+		self.dist.fill(math.inf)
+		self.pred.fill(-1)
+		self.recompute(np.arange(self.n))
+
+	def recompute(self, sources):
+		# a lazy oracle computes them when they are next read; with scipy all the
+		# rows are computed at once by csgraph, a networkx graph is converted first
+		if self.lazy:
+			for s in sources:
+				self.rows.pop(s, None)
+			return
+		if len(sources) and sparse() is not None:
+			metrics.counters["dijkstra_runs"] += len(sources)
+			graph = self.graph if isinstance(self.graph, CSRGraph) else CSRGraph.from_arrays(self.n, *self.edgeArrays())
+			self.dist[sources], self.pred[sources] = graph.shortest_paths(sources)
+			return
+		for s in sources:
+			self.dist[s], self.pred[s] = self.dijkstra(s)
+
+	def edgeArrays(self):
+		# (u, v, weight) arrays of the edges of a networkx graph
+		edges = list(self.graph.edges(data="weight"))
+		if not len(edges):
+			return (np.zeros(0, dtype=int),)*3
+		return (np.array(x) for x in zip(*edges))
+
+	def row(self, source):
+		# (dist, pred) rows of source for a lazy oracle, computed if not kept,
+		# with scipy's csgraph when it is installed
+		rows = self.rows.get(source)
+		if rows is not None:
+			self.rows.move_to_end(source)
+			return rows
+		if self.graph.has_csgraph():
+			metrics.counters["dijkstra_runs"] += 1
+			dist, pred = self.graph.shortest_paths([source])
+			rows = (dist[0], pred[0])
+		else:
+			dist, pred = self.dijkstra(source)
+			rows = (np.array(dist), np.array(pred, dtype=np.int64))
+		self.rows[source] = rows
+		if len(self.rows) > self.limit:
+			self.rows.popitem(last=False)
+		return rows
+
+	def dijkstra(self, source):
+		# (dist, pred) of row "source": dist[s, t] and the predecessor of t on the path s -> t
+		# plain lists while relaxing, numpy scalar indexing is much slower
+		metrics.counters["dijkstra_runs"] += 1
+		n = self.n
+		dist = [math.inf] * n
+		pred = [-1] * n
+		dist[source] = 0
+		heap = [(0, source)]
+		done = [False] * n
+		while heap:
+			d, u = heapq.heappop(heap)
+			if done[u]:
+				continue
+			done[u] = True
+			for v, attrs in self.graph[u].items():
+				nd = d + attrs["weight"]
+				if nd < dist[v]:
+					dist[v] = nd
+					pred[v] = u
+					heapq.heappush(heap, (nd, v))
+		return (dist, pred)
+
+	def remove_edge(self, u, v):
+		# call after (u, v) is removed from the graph: only the sources whose
+		# shortest path tree used the edge are recomputed, the rest stay valid.
+		# A lazy oracle drops the rows it kept that used it; the rows it did not
+		# keep are not known, the repair is logged as changing every row (None)
+		if self.lazy:
+			affected = np.array([s for s, (dist, pred) in self.rows.items() if pred[v] == u or pred[u] == v], dtype=np.int64)
+			self.version += 1
+			self.repairs.append((self.version, None))
+		else:
+			affected = np.flatnonzero((self.pred[:, v] == u) | (self.pred[:, u] == v))
+			if len(affected):
+				self.version += 1
+				self.repairs.append((self.version, set(affected.tolist())))
+		self.recompute(affected)
+		return affected
+
+	def forget(self):
+		# every row may have changed, the repair log starts over
+		self.base = self.version
+		self.repairs = []
+
+	def changedSince(self, version):
+		# rows that differ from the tables at version, None if not known
+		if version is None or version < self.base:
+			return None
+		rows = set()
+		for v, affected in self.repairs:
+			if v > version:
+				if affected is None:
+					return None
+				rows |= affected
+		return rows
+
+	def distance(self, u, v):
+		# the graph is undirected: a lazy oracle reads the row of v, trucks ask
+		# for the few targets they head to from ever changing places
+		return self.dist[v, u] if self.lazy else self.dist[u, v]
+
+	def next_hop(self, u, v):
+		# the graph is undirected, so the hop after u towards v is the
+		# predecessor of u in the shortest path tree rooted at v
+		return int(self.pred[v, u])
+
+def nearest_target(graph, source, targets):
+	# single weighted Dijkstra from source that stops at the first target it
+	# settles; returns (cost, target, first hop) or (inf, None, None)
+	metrics.counters["nearest_target_queries"] += 1
+	targets = set(targets)
+	dist = {source: 0}
+	first = {source: None}
+	heap = [(0, source)]
+	done = set()
+	while heap:
+		d, u = heapq.heappop(heap)
+		if u in done:
+			continue
+		if u in targets:
+			return (d, u, first[u])
+		done.add(u)
+		for v, attrs in graph[u].items():
+			nd = d + attrs["weight"]
+			if nd < dist.get(v, math.inf):
+				dist[v] = nd
+				first[v] = v if u == source else first[u]
+				heapq.heappush(heap, (nd, v))
+	return (math.inf, None, None)
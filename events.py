@@ -0,0 +1,226 @@
+#!/usr/bin/python
+import functools
+import heapq
+import math
+import numpy as np
+from random import *
+from timing import EVENTS, MARKET, GAME_OVER, COMPANIES
+
+# event kinds, also the order in which the events of a tick are handled
+EDGE_EXPLOSION = 0
+TRUCK_EXPLOSION = 1
+ARRIVAL = 2 # a truck reaches a node, or leaves the depot
+BANKRUPTCY = 3
+OFFER = 4
+
+@functools.lru_cache(maxsize=None)
+def tick_probability(p):
+	# chance of randint(1,99)/100 < p, the per tick draw of Simulation.run
+	return sum(1 for k in range(1, 100) if k/100 < p)/99
+
+def geometric(p):
+	# ticks until the next success of a per tick draw with probability p
+	if p <= 0:
+		return math.inf
+	if p >= 1:
+		return 1
+	return 1 + int(math.log(1 - random())/math.log(1 - p))
+
+class EventQueue(object):
+	# events ordered by (time, kind), then by insertion; the ones at or past
+	# the horizon are never handled so they are not kept either
+	def __init__(self, horizon):
+		self.horizon = horizon
+		self.heap = []
+		self.count = 0
+
+	def __repr__(self):
+		return f"EventQueue with {len(self.heap)} events"
+
+	def __len__(self):
+		return len(self.heap)
+
+	def push(self, time, kind, data=None):
+		if time < self.horizon:
+			heapq.heappush(self.heap, (time, kind, self.count, data))
+			self.count += 1
+
+	def pop(self):
+		time, kind, _, data = heapq.heappop(self.heap)
+		return (time, kind, data)
+
+	def peek(self):
+		return self.heap[0][0]
+
+class Arrivals(object):
+	# the ticks at which each client makes an offer and edges and trucks explode:
+	# each is drawn as a geometric skip from the previous one, so a tick only
+	# visits the clients and explosions that fire in it. The tick engine pops
+	# them per tick, the event engine draws them into its own queue
+	def __init__(self, sim, clients, iterations, queue=None):
+		self.p_offer = [tick_probability(cli.risk) for cli in clients]
+		self.p_edge = tick_probability(sim.p_edge_explosion)
+		self.p_truck = tick_probability(sim.p_truck_explosion)
+		self.queue = queue if queue is not None else EventQueue(iterations)
+		self.queue.push(geometric(self.p_edge) - 1, EDGE_EXPLOSION)
+		self.queue.push(geometric(self.p_truck) - 1, TRUCK_EXPLOSION)
+		for k in range(len(clients)):
+			self.queue.push(geometric(self.p_offer[k]) - 1, OFFER, k)
+
+	def __repr__(self):
+		return f"Arrivals with {len(self.queue)} pending draws"
+
+	def pop(self, t):
+		# (edge explosion, truck explosion, clients making an offer in client order) at tick t
+		edge = truck = False
+		firing = []
+		while self.queue and self.queue.peek() == t:
+			t, kind, k = self.queue.pop()
+			if kind == EDGE_EXPLOSION:
+				edge = True
+			elif kind == TRUCK_EXPLOSION:
+				truck = True
+			else:
+				firing.append(k)
+			self.rearm(t, kind, k)
+		firing.sort()
+		return (edge, truck, firing)
+
+	def rearm(self, t, kind, k=None):
+		# draws the next one of an event that fired at tick t, k - the client of an offer
+		p = self.p_edge if kind == EDGE_EXPLOSION else self.p_truck if kind == TRUCK_EXPLOSION else self.p_offer[k]
+		self.queue.push(t + geometric(p), kind, k)
+
+class EventEngine(object):
+	# runs a simulation as a sequence of events instead of visiting every agent
+	# every tick: a truck takes as many ticks as the edge it travels weighs,
+	# clients, explosions and bankruptcies fire at drawn ticks and the clock
+	# jumps to the next event. Existence taxes are settled when a company is
+	# next touched, filling its money series for the ticks skipped meanwhile
+	def __init__(self, sim, g, companies, clients, iterations):
+		self.sim = sim
+		self.g = g
+		self.companies = companies
+		self.clients = clients
+		self.iterations = iterations
+		self.rate = sim.company_init_money*sim.existence_tax
+		self.index = dict((c[1], j) for j, c in enumerate(companies))
+		self.active = set(self.index)
+		self.money_per_company = np.zeros((len(companies), iterations))
+		self.last = [-1] * len(companies) # last tick written to the money series
+		self.version = [0] * len(companies) # invalidates scheduled bankruptcies
+		self.dirty = set()
+		self.queue = EventQueue(iterations)
+		self.timer = sim.timer
+
+	def __repr__(self):
+		return f"EventEngine with {len(self.companies)} companies and {len(self.queue)} pending events"
+
+	def run(self):
+		sim = self.sim
+		arrivals = Arrivals(sim, self.clients, self.iterations, self.queue)
+		for c in self.companies:
+			self.scheduleBankruptcy(c[1], -1)
+
+		timer = self.timer
+		while self.queue and self.companies:
+			t = self.queue.peek()
+			if timer is not None:
+				timer.tick(t)
+			offers = []
+			bidders = []
+			while self.queue and self.queue.peek() == t:
+				t, kind, data = self.queue.pop()
+				if kind == EDGE_EXPLOSION:
+					sim.do_edge_explosion(t, self.g)
+					arrivals.rearm(t, kind)
+				elif kind == TRUCK_EXPLOSION:
+					sim.do_truck_explosion(t, self.g, self.companies)
+					arrivals.rearm(t, kind)
+				elif kind == ARRIVAL:
+					self.arrive(t, *data)
+				elif kind == BANKRUPTCY:
+					company, version = data
+					if company in self.active and version == self.version[self.index[company]]:
+						self.touch(company, t)
+				else:
+					cli = self.clients[data]
+					offers.append(cli.makeOffer(t))
+					bidders.append(cli)
+					arrivals.rearm(t, kind, data)
+				if timer is not None:
+					timer.mark(MARKET if kind == OFFER else EVENTS if kind < ARRIVAL else COMPANIES)
+			if offers != []:
+				for c in self.companies:
+					self.touch(c[1], t)
+				sim.awardOffers(offers, bidders, self.companies)
+				if timer is not None:
+					timer.mark(MARKET)
+			self.endTick(t)
+
+		for c in self.companies:
+			self.settle(c[1], self.iterations)
+			sim.completedOffers += c[1].getCompletedOffers()
+		return self.money_per_company
+
+	def arrive(self, t, company, slot):
+		if company not in self.active or not company.fleet.alive[slot]:
+			return
+		self.touch(company, t)
+		weight = company.trucks[slot].go(self.g)
+		if weight is not None:
+			self.queue.push(t + max(1, math.ceil(weight)), ARRIVAL, (company, slot))
+
+	def touch(self, company, t):
+		# the company takes part in tick t, bring its money up to t - 1
+		if company not in self.dirty:
+			self.settle(company, t)
+			self.dirty.add(company)
+
+	def settle(self, company, t):
+		# existence taxes of the ticks since the last one written, up to t - 1
+		j = self.index[company]
+		n = t - 1 - self.last[j]
+		if n > 0:
+			self.money_per_company[j, self.last[j]+1:t] = company.money - self.rate*np.arange(1, n+1)
+			company.money -= n*self.rate
+			self.last[j] = t - 1
+
+	def endTick(self, t):
+		# what Simulation.run does for every company each tick, here only for
+		# the companies touched by the events of tick t
+		for c in list(self.companies):
+			company = c[1]
+			if company not in self.dirty:
+				continue
+			j = self.index[company]
+			if company.money <= 0:
+				self.sim.completedOffers += company.getCompletedOffers()
+				self.sim.do_game_over(self.companies, c, self.g, t)
+				self.active.discard(company)
+				for cli in self.clients:
+					cli.removeCompany(company)
+				if self.timer is not None:
+					self.timer.mark(GAME_OVER)
+				continue
+			company.money -= self.rate
+			company.assignOffers(t)
+			for slot in company.updateTrucks():
+				self.queue.push(t + 1, ARRIVAL, (company, slot))
+			self.money_per_company[j, t] = company.money
+			self.last[j] = t
+			self.version[j] += 1
+			self.scheduleBankruptcy(company, t)
+			if self.timer is not None:
+				self.timer.mark(COMPANIES)
+		self.dirty.clear()
+
+	def scheduleBankruptcy(self, company, t):
+		# taxes alone take the money to 0 after n ticks, the company is out on the next
+		if company.money <= 0:
+			n = 0
+		elif self.rate > 0:
+			n = math.ceil(company.money/self.rate)
+		else:
+			return
+		self.queue.push(t + n + 1, BANKRUPTCY, (company, self.version[self.index[company]]))
@@ -0,0 +1,165 @@
+#!/usr/bin/python
+import copy
+import math
+import numpy as np
+import metrics
+from offer import Offer
+
+# status
+#  0 - ocupado
+#  1 - livre
+OCUPADO = 0
+LIVRE = 1
+
+class TruckFleet(object):
+	# state of a company's trucks kept as arrays (one slot per truck) so that
+	# quoting and status updates are masked numpy expressions over the whole fleet
+	def __init__(self, n_trucks, depot, capacity=300):
+		self.depot = depot
+		self.trucks = [None] * n_trucks
+		self.pos = np.full(n_trucks, depot, dtype=np.int64)
+		self.status = np.full(n_trucks, LIVRE, dtype=np.int8)
+		self.capacity = np.zeros(n_trucks) # capacity in use
+		self.totalCapacity = np.full(n_trucks, capacity, dtype=float)
+		self.totalValue = np.zeros(n_trucks)
+		self.alive = np.ones(n_trucks, dtype=bool)
+		self.free = np.ones(n_trucks, dtype=bool) # alive and livre
+		# reach[x, t] - cost for truck t to also serve node x: what inserting x
+		# at the cheapest point of the truck's planned tour adds to it
+		self.reach = None
+		self.oracle = None
+		self.version = None
+		self.stale = set() # slots whose plan changed while reach was out of date
+
+	def __repr__(self):
+		return f"Fleet of {len(self.trucks)} trucks from {self.depot}, {self.free.sum()} free"
+
+	def __len__(self):
+		return len(self.trucks)
+
+	def bind(self, slot, truck):
+		# moves the state of a truck into this fleet's slot
+		self.trucks[slot] = truck
+		self.pos[slot] = truck.pos
+		self.setStatus(slot, truck.status)
+		self.capacity[slot] = truck.capacity
+		self.totalCapacity[slot] = truck.totalCapacity
+		self.totalValue[slot] = truck.totalValue
+		truck.fleet = self
+		truck.slot = slot
+
+	def setOracle(self, oracle):
+		self.oracle = oracle
+		self.version = None
+
+	def sync(self):
+		# reach only depends on distances between a truck's stops: after a repair
+		# only the trucks with a stop on a recomputed row are priced again
+		if self.version == self.oracle.version and self.reach is not None:
+			metrics.counters["fleet_sync_hits"] += 1
+			return
+		rows = None if self.reach is None else self.oracle.changedSince(self.version)
+		if rows is None:
+			metrics.counters["fleet_sync_misses"] += 1
+			self.reach = np.empty((len(self.oracle.dist), len(self.trucks)))
+			slots = range(len(self.trucks))
+		else:
+			metrics.counters["fleet_sync_partial"] += 1
+			slots = [slot for slot in range(len(self.trucks)) if slot in self.stale or not rows.isdisjoint(self.stops(slot))]
+		for slot in slots:
+			self.reach[:, slot] = self.deltas(self.stops(slot))
+		self.stale.clear()
+		self.version = self.oracle.version
+
+	def stops(self, slot):
+		return [self.depot] + self.trucks[slot].plan
+
+	def deltas(self, stops):
+		# cost of also visiting each node on the tour through stops (in order),
+		# after the last stop or between two consecutive ones, whichever is cheaper
+		dist = self.oracle.dist
+		delta = dist[stops[-1]].copy()
+		if len(stops) > 1:
+			a, b = np.array(stops[:-1]), np.array(stops[1:])
+			legs = dist[a, b]
+			ok = legs != math.inf
+			if ok.any():
+				inner = (dist[a[ok]] + dist[b[ok]] - legs[ok, None]).min(axis=0)
+				np.minimum(delta, inner, out=delta)
+		return delta
+
+	def updateStops(self, slot):
+		# the plan of a truck changed; priced now if reach is current, by sync otherwise
+		if self.oracle is None:
+			return
+		if self.reach is not None and self.version == self.oracle.version:
+			self.reach[:, slot] = self.deltas(self.stops(slot))
+		else:
+			self.stale.add(slot)
+
+	def setStatus(self, slot, status):
+		self.status[slot] = status
+		self.free[slot] = self.alive[slot] and status == LIVRE
+
+	def busy(self):
+		return np.flatnonzero(self.alive & (self.status == OCUPADO))
+
+	def prices(self, target, quantity):
+		# without an oracle there is no reach, every free truck prices the item itself
+		item = Offer(target, quantity, None)
+		return np.array([self.trucks[slot].getPrice(item) if self.free[slot] else math.inf for slot in range(len(self.trucks))])
+
+	def quote(self, target, quantity):
+		# (cost, slot) of the cheapest free truck with room for quantity
+		if not self.free.any():
+			return (math.inf, -1)
+		if self.oracle is None:
+			costs = self.prices(target, quantity)
+			slot = costs.argmin()
+			return (costs[slot], slot)
+		self.sync()
+		costs = np.where(self.free & (self.totalCapacity - self.capacity >= quantity), self.reach[target], math.inf)
+		slot = costs.argmin()
+		return (costs[slot], slot)
+
+	def quoteMany(self, targets, quantities):
+		# cheapest free truck cost for each (target, quantity) pair
+		if not self.free.any():
+			return np.full(len(targets), math.inf)
+		if self.oracle is None:
+			return np.array([self.prices(t, q).min() for t, q in zip(targets.tolist(), quantities.tolist())])
+		self.sync()
+		fits = self.free & (self.totalCapacity - self.capacity >= quantities[:, None])
+		return np.where(fits, self.reach[targets], math.inf).min(axis=1)
+
+	def dispatchFull(self, threshold):
+		# free trucks with less than threshold capacity left go out to deliver,
+		# returns their slots
+		full = self.free & (self.totalCapacity - self.capacity < threshold)
+		self.status[full] = OCUPADO
+		self.free[full] = False
+		return np.flatnonzero(full)
+
+	def explode(self, slot):
+		self.alive[slot] = False
+		self.free[slot] = False
+
+	def getState(self):
+		items = [(list(t.plan), [copy.copy(item) for item in t.items.values()]) for t in self.trucks]
+		return (self.pos.copy(), self.status.copy(), self.capacity.copy(), self.totalCapacity.copy(), self.totalValue.copy(), self.alive.copy(), items)
+
+	def setState(self, state):
+		pos, status, capacity, totalCapacity, totalValue, alive, items = state
+		self.pos[:] = pos
+		self.status[:] = status
+		self.capacity[:] = capacity
+		self.totalCapacity[:] = totalCapacity
+		self.totalValue[:] = totalValue
+		self.alive[:] = alive
+		self.free[:] = alive & (status == LIVRE)
+		for t, (plan, t_items) in zip(self.trucks, items):
+			t.plan = list(plan)
+			t.items = dict((item.target, copy.copy(item)) for item in t_items)
+			t.planned = None
+		self.version = None
+		self.stale.clear()
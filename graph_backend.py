@@ -0,0 +1,203 @@
+#!/usr/bin/python
+import networkx as nx
+import numpy as np
+
+scipy = False # scipy.sparse with csgraph once loaded, None without scipy
+
+def sparse():
+	# scipy is optional, DistanceOracle then runs its own Dijkstra; it is only
+	# imported by the first graph that needs it
+	global scipy
+	if scipy is False:
+		try:
+			import scipy.sparse.csgraph
+		except ImportError:
+			scipy = None
+	return scipy and scipy.sparse
+
+class NodeView(object):
+	# graph.nodes / graph.node of a CSRGraph: nodes 0..n-1 and their attributes
+	def __init__(self, data):
+		self.data = data
+
+	def __call__(self, data=False):
+		return list(enumerate(self.data)) if data else self
+
+	def __iter__(self):
+		return iter(range(len(self.data)))
+
+	def __len__(self):
+		return len(self.data)
+
+	def __contains__(self, n):
+		return 0 <= n < len(self.data)
+
+	def __getitem__(self, n):
+		return self.data[n]
+
+class Adjacency(object):
+	# graph[u]: the neighbours of u that are still connected and their edges' attributes
+	def __init__(self, graph, u):
+		self.graph = graph
+		self.u = u
+
+	def entries(self):
+		g = self.graph
+		k = np.arange(g.indptr[self.u], g.indptr[self.u+1])
+		return k[g.alive[k]]
+
+	def __getitem__(self, v):
+		k = self.graph.entry(self.u, v)
+		if k < 0 or not self.graph.alive[k]:
+			raise KeyError(v)
+		return {"weight": self.graph.weights[k].item()}
+
+	def __contains__(self, v):
+		k = self.graph.entry(self.u, v)
+		return k >= 0 and self.graph.alive[k]
+
+	def __iter__(self):
+		return iter(self.graph.indices[self.entries()].tolist())
+
+	def __len__(self):
+		return len(self.entries())
+
+	def items(self):
+		k = self.entries()
+		return zip(self.graph.indices[k].tolist(), ({"weight": w} for w in self.graph.weights[k].tolist()))
+
+class CSRGraph(object):
+	# undirected weighted graph kept as a CSR matrix, with both directions of
+	# every edge and a mask of the entries still there: removing an edge (and
+	# adding it back) only flips its two entries. It reads like the networkx
+	# Graph the model was written against: graph[u][v]["weight"], graph[u].items(),
+	# edges(), remove_edge, add_edge and graph.nodes / graph.node attributes
+	def __init__(self, n, edges, node_data=None):
+		# edges - (u, v, weight) triples, nodes are 0..n-1
+		self.nodes = NodeView(node_data if node_data is not None else [dict() for _ in range(n)])
+		self.build(n, edges)
+
+	def build(self, n, edges):
+		u, v, w = (np.array(x) for x in zip(*edges)) if len(edges) else (np.zeros(0, dtype=int),)*3
+		self.fill(n, u, v, w)
+
+	def fill(self, n, u, v, w):
+		rows = np.concatenate([u, v]).astype(np.int64)
+		cols = np.concatenate([v, u]).astype(np.int64)
+		order = np.lexsort((cols, rows))
+		self.rows = rows[order]
+		self.indices = cols[order]
+		self.weights = np.concatenate([w, w])[order]
+		self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.rows, minlength=n))])
+		self.alive = np.ones(len(self.indices), dtype=bool)
+		self.cached = None # scipy matrix of the entries alive
+
+	@classmethod
+	def from_arrays(cls, n, u, v, w):
+		# edges u[k]-v[k] of weight w[k], without going through python lists
+		g = cls(n, [])
+		g.fill(n, np.asarray(u), np.asarray(v), np.asarray(w))
+		return g
+
+	@classmethod
+	def from_networkx(cls, g):
+		return cls(g.number_of_nodes(), [(u, v, d["weight"]) for u, v, d in g.edges(data=True)], [dict(g.nodes[n]) for n in range(g.number_of_nodes())])
+
+	def to_networkx(self):
+		g = nx.Graph()
+		g.add_nodes_from(self.nodes(data=True))
+		g.add_weighted_edges_from(self.edges(data="weight"))
+		return g
+
+	def __repr__(self):
+		return f"CSRGraph with {self.number_of_nodes()} nodes and {self.number_of_edges()} edges"
+
+	def __len__(self):
+		return len(self.nodes)
+
+	def __iter__(self):
+		return iter(self.nodes)
+
+	def __contains__(self, n):
+		return n in self.nodes
+
+	def __getitem__(self, u):
+		return Adjacency(self, u)
+
+	@property
+	def node(self):
+		return self.nodes
+
+	def number_of_nodes(self):
+		return len(self.nodes)
+
+	def number_of_edges(self):
+		return int(self.alive.sum()) // 2
+
+	def entry(self, u, v):
+		# position of (u, v) in indices, -1 if it was never an edge
+		start, end = self.indptr[u], self.indptr[u+1]
+		k = start + np.searchsorted(self.indices[start:end], v)
+		return int(k) if k < end and self.indices[k] == v else -1
+
+	def has_edge(self, u, v):
+		return v in self[u]
+
+	def edges(self, data=False):
+		# (u, v) with u < v, sorted
+		mask = self.alive & (self.indices > self.rows)
+		u, v = self.rows[mask].tolist(), self.indices[mask].tolist()
+		if data is False:
+			return list(zip(u, v))
+		w = self.weights[mask].tolist()
+		if data is True:
+			return [(a, b, {"weight": c}) for a, b, c in zip(u, v, w)]
+		return list(zip(u, v, w))
+
+	def remove_edge(self, u, v):
+		k, l = self.entry(u, v), self.entry(v, u)
+		if k < 0 or not self.alive[k]:
+			raise nx.NetworkXError(f"The edge {u}-{v} is not in the graph")
+		self.alive[k] = self.alive[l] = False
+		self.cached = None
+
+	def add_edge(self, u, v, weight=1):
+		k, l = self.entry(u, v), self.entry(v, u)
+		if k < 0:
+			# a new edge changes the structure, rare enough to rebuild it
+			self.build(len(self.nodes), self.edges(data="weight") + [(u, v, weight)])
+			return
+		self.alive[k] = self.alive[l] = True
+		self.weights[k] = self.weights[l] = weight
+		self.cached = None
+
+	def copy(self):
+		g = CSRGraph(0, [], [dict(d) for d in self.nodes.data])
+		g.rows, g.indices, g.weights = self.rows.copy(), self.indices.copy(), self.weights.copy()
+		g.indptr, g.alive = self.indptr.copy(), self.alive.copy()
+		return g
+
+	def has_csgraph(self):
+		return sparse() is not None
+
+	def matrix(self):
+		if self.cached is None:
+			n = len(self.nodes)
+			self.cached = sparse().csr_matrix((self.weights[self.alive].astype(float), (self.rows[self.alive], self.indices[self.alive])), shape=(n, n))
+		return self.cached
+
+	def shortest_paths(self, sources):
+		# (dist, pred) rows of the given sources, pred -1 where there is none
+		dist, pred = sparse().csgraph.dijkstra(self.matrix(), directed=True, indices=sources, return_predecessors=True)
+		pred[pred < 0] = -1
+		return (dist, pred)
+
+	def is_connected(self):
+		if sparse() is not None:
+			return sparse().csgraph.connected_components(self.matrix(), directed=False)[0] == 1
+		return nx.is_connected(self.to_networkx())
+
+	def __getstate__(self):
+		state = dict(self.__dict__)
+		state["cached"] = None
+		return state
@@ -1,7 +1,9 @@
 import networkx as nx 
 from random import randint
 import random
-import matplotlib.pylab as plt
+import numpy as np
+from graph_backend import CSRGraph
+import render
 
 colormap = []
 colors = ["blue", "green", "red", "cyan", "magenta", "orange", "grey", "yellow", "black", "darkblue", "brown"]
@@ -15,34 +17,98 @@ def randColor(colormap):
     seed = randint(0,len(colors)-1)
     return color
 
+def pyplot():
+    # matplotlib is only loaded by the first plot, runs and sweep workers never pay for it
+    import matplotlib.pyplot as plt
+    return plt
+
+def graph_spec(graph):
+    # the graph as a render spec, nodes coloured by colormap
+    return render.graph(list(graph.nodes()), list(graph.edges(data="weight")), list(colormap))
+
 def draw_graph(graph):
-    d = dict(nx.degree(graph))
-    pos = nx.spring_layout(graph)
-    plt.figure()
-    nx.draw(graph, pos=pos, with_labels=graph.nodes().values(),nodelist=d.keys(), node_size=[(v+1) * 100 for v in d.values()], node_color=colormap)
-    labels = nx.get_edge_attributes(graph,'weight')
-    nx.draw_networkx_edge_labels(graph,pos, edge_labels=labels)
+    # draws here, experiments hand graph_spec to the renderer instead
+    render.draw(graph_spec(graph), pyplot())
+
+def is_connected(graph):
+    if not isinstance(graph, nx.Graph):
+        return graph.is_connected()
+    return nx.is_connected(graph)
 
 def show_graphs():
-    plt.show()
+    pyplot().show()
 
-def generate_weighted_random_graph(n=15, p=0.2, min_weight=1, max_weight=10):
-    global seed
-    seed=randint(1,100)
-    g = nx.gnp_random_graph(n, p, seed=seed)
-    random.seed(seed+1)
-    for (u,v,w) in g.edges(data=True):
-        w['weight'] = randint(min_weight, max_weight)
+def pair_edges(n, k):
+    # the pairs (u, v), u < v, numbered k = v*(v-1)/2 + u
+    v = ((1 + np.sqrt(1 + 8*k.astype(float)))/2).astype(np.int64)
+    v -= v*(v-1)//2 > k # sqrt rounding
+    v += (v+1)*v//2 <= k
+    return (k - v*(v-1)//2, v)
+
+def gnp_edges(n, p, rng):
+    # G(n,p) in O(n + m): geometric skips between the pairs that are edges
+    # (Batagelj and Brandes), drawn in batches instead of testing every pair
+    pairs = n*(n-1)//2
+    if p <= 0 or pairs == 0:
+        return (np.zeros(0, dtype=np.int64),)*2
+    if p >= 1:
+        return pair_edges(n, np.arange(pairs, dtype=np.int64))
+    chunks, last = [], -1
+    while last < pairs:
+        todo = (pairs - last)*p
+        k = last + np.cumsum(rng.geometric(p, size=int(todo + 5*np.sqrt(todo) + 10)))
+        chunks.append(k)
+        last = k[-1]
+    k = np.concatenate(chunks)
+    return pair_edges(n, k[k < pairs])
+
+def barabasi_edges(n, m, rng):
+    # preferential attachment from a star of m+1 nodes, like nx.barabasi_albert_graph:
+    # ends holds both ends of every edge so far, so a uniform pick from it is a
+    # pick by degree; the random numbers are drawn in batches
+    if m < 1 or m >= n:
+        raise nx.NetworkXError(f"Barabasi-Albert network must have m >= 1 and m < n, m = {m}, n = {n}")
+    u, v = [0]*m, list(range(1, m+1))
+    ends = u + v
+    draws, d = rng.random(4*m*n).tolist(), 0
+    for source in range(m+1, n):
+        targets = set()
+        while len(targets) < m:
+            if d == len(draws):
+                draws, d = rng.random(4*m*n).tolist(), 0
+            targets.add(ends[int(draws[d]*len(ends))])
+            d += 1
+        for t in targets:
+            u.append(source)
+            v.append(t)
+            ends.append(source)
+            ends.append(t)
+    return (np.array(u, dtype=np.int64), np.array(v, dtype=np.int64))
+
+def weighted_graph(n, u, v, rng, min_weight, max_weight, backend):
+    # weights drawn in one batch, straight into a networkx Graph or a CSRGraph
+    w = rng.integers(min_weight, max_weight, size=len(u), endpoint=True)
+    if backend == "csr":
+        return CSRGraph.from_arrays(n, u, v, w)
+    g = nx.Graph()
+    g.add_nodes_from(range(n))
+    g.add_weighted_edges_from(zip(u.tolist(), v.tolist(), w.tolist()))
     return g
 
-def generate_weighted_barabasi_graph(n=20, m=3, min_weight=1, max_weight=10):
+def generate_weighted_random_graph(n=15, p=0.2, min_weight=1, max_weight=10, backend="networkx"):
+    # the graph only takes a seed from the global random, it doesn't reseed it
     global seed
-    seed=randint(1,100)
-    g = nx.barabasi_albert_graph(n, m, seed=seed)
-    random.seed(seed+1)
-    for (u,v,w) in g.edges(data=True):
-        w['weight'] = randint(min_weight, max_weight)
-    return g
+    seed=randint(1, 2**31)
+    rng = np.random.default_rng(seed)
+    u, v = gnp_edges(n, p, rng)
+    return weighted_graph(n, u, v, rng, min_weight, max_weight, backend)
+
+def generate_weighted_barabasi_graph(n=20, m=3, min_weight=1, max_weight=10, backend="networkx"):
+    global seed
+    seed=randint(1, 2**31)
+    rng = np.random.default_rng(seed)
+    u, v = barabasi_edges(n, m, rng)
+    return weighted_graph(n, u, v, rng, min_weight, max_weight, backend)
 
 def set_ncompany_nodes(graph, companies):
     # set companies to specific nodes
@@ -59,4 +125,4 @@ def set_company_nodes(graph, companies):
     nx.set_node_attributes(graph, cps, name="company")
     # color companies in graph
     for n in graph.nodes:
-        colormap.append(randColor(colormap)) if "company" in graph.node[n] else colormap.append("#%06x" % 0xDDDDDD)
+        colormap.append(randColor(colormap)) if "company" in graph.nodes[n] else colormap.append("#%06x" % 0xDDDDDD)
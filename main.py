@@ -1,10 +1,11 @@
-import networkx as nx
-import matplotlib.pylab as plt
 from random import *
+import argparse
 import graph_utils
-from company import *
-from truck import *
-from client import *
+from checkpoint import Checkpoint
+from distance_oracle import DistanceOracle
+from company import Company
+from truck import Truck
+from client import Client
      
 company_names = ["A", "B", "C", "D","E","F","G","H","I","J","K"]
 def generate_companies(graph, n_companies=5):
@@ -21,68 +22,96 @@ def generate_trucks(graph, companies, n_trucks=7):
     for c in companies:
         c[1].setTrucks([Truck(i, c[1], graph) for i in range(n_trucks)])
 
-def do_edge_explosion(t,graph):
+def do_edge_explosion(t,graph,oracle):
+    # False once there is no edge left, the run ends there
     try:
         e = choice(list(graph.edges()))
     except Exception as e:
         print(f"\tall edges removed t= {t}\t")
-        exit()
+        return False
     graph.remove_edge(e[0],e[1])
+    oracle.remove_edge(e[0],e[1])
     print(f"\tedge removed:\t {e[0]} -- {e[1]} (t={t})")
+    return True
 
 def do_game_over(companies, company, graph,t):
     print(f"GAME OVER FOR {company[1]} at t={t} -- offers={company[1].completedOffers}")
     companies.remove(company)
-    del graph.node[company[0]]['company']
+    del graph.nodes[company[0]]['company']
     graph_utils.colormap[company[0]]= "#%06x" % 0xDDDDDD
 
 
-# def main():
-g = graph_utils.generate_weighted_random_graph(n=15, p=0.2, min_weight=1, max_weight=10)
-# g = graph_utils.generate_weighted_barabasi_graph()
-
-companies = generate_companies(g, n_companies=5)
-generate_trucks(g, companies, n_trucks=7)
-clients = [Client(n, [c[1] for c in companies], min_offer_val=20, max_offer_val=100) for n in g.nodes if "company" not in g.node[n]]
-
-# graph_utils.draw_graph(g)
-
-p_remove = 0.02 # por random
-graph_utils.draw_graph(g)
-graph_utils.show_graphs()
-for i in range(10000):
-    if not len(companies):
-        print("NO MORE COMPANIES")
-        break
-
-    if len(companies) == 1:
-        print(f"WINNER: {c} -- t={i} -- offers={companies[0][1].completedOffers}")
-        
-
-    if (randint(1,99)/100) < p_remove:
-        do_edge_explosion(i,g)
-
-    for cli in clients:
-        cli.go(i)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one simulation of 10000 ticks")
+    parser.add_argument("--checkpoint", help="file the run is saved to, a run that was stopped goes on from it")
+    parser.add_argument("--every", type=int, default=1000, help="ticks between checkpoints (1000)")
+    args = parser.parse_args(argv)
+    checkpoint = Checkpoint(args.checkpoint, args.every) if args.checkpoint else None
+    state = checkpoint.load() if checkpoint is not None else None
+
+    if state is None:
+        start = 0
+        g = graph_utils.generate_weighted_random_graph(n=15, p=0.2, min_weight=1, max_weight=10)
+        # g = graph_utils.generate_weighted_barabasi_graph()
+
+        companies = generate_companies(g, n_companies=5)
+        generate_trucks(g, companies, n_trucks=7)
+        oracle = DistanceOracle(g)
+        for c in companies:
+            c[1].setOracle(oracle)
+        clients = [Client(n, [c[1] for c in companies], min_offer_val=20, max_offer_val=100) for n in g.nodes if "company" not in g.nodes[n]]
+
+        # graph_utils.draw_graph(g)
+        graph_utils.draw_graph(g)
+        graph_utils.show_graphs()
+    else:
+        # the objects saved are shared as they were: trucks, clients and companies keep the same oracle and graph
+        i, g, companies, clients, oracle, colormap, rng = state
+        graph_utils.colormap[:] = colormap
+        setstate(rng)
+        start = i + 1
+        print(f"resuming at t={start}")
+
+    p_remove = 0.02 # por random
+    for i in range(start, 10000):
+        if not len(companies):
+            print("NO MORE COMPANIES")
+            break
+
+        if len(companies) == 1:
+            print(f"WINNER: {companies[0]} -- t={i} -- offers={companies[0][1].completedOffers}")
+
+
+        if (randint(1,99)/100) < p_remove and not do_edge_explosion(i,g,oracle):
+            break
+
+        for cli in clients:
+            cli.go(i)
+
+        for c in companies:
+            if c[1].money <= 0:
+                do_game_over(companies, c, g,i)
+                for cli in clients:
+                    cli.setCompanies([c[1] for c in companies])
+                continue
+
+            # c[1].money -= c[1].money*0.001 # impostos por existencia
+            c[1].go(g, i)
+
+            # if not i % 100:
+            #     print(c[1])
+
+        if checkpoint is not None and checkpoint.due(i):
+            checkpoint.save((i, g, companies, clients, oracle, list(graph_utils.colormap), getstate()))
+
+    if checkpoint is not None:
+        checkpoint.clear()
 
     for c in companies:
-        if c[1].money <= 0:
-            do_game_over(companies, c, g,i)
-            for cli in clients:
-                cli.setCompanies([c[1] for c in companies])
-            continue
-
-        # c[1].money -= c[1].money*0.001 # impostos por existencia
-        c[1].go(g, i)
-
-        # if not i % 100:
-        #     print(c[1])
-
-for c in companies:
-    print(f"SURVIVOR: {c} -- t={i} -- offers={c[1].completedOffers}")
+        print(f"SURVIVOR: {c} -- t={i} -- offers={c[1].completedOffers}")
 
     # graph_utils.draw_graph(g)
     # graph_utils.show_graphs()
 
-# if __name__ == '__main__':
-#     main()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+import json
+import os
+
+# counts of the work the simulation does, reset by Simulation.run at the start
+# of every run; each worker process has its own
+HELP = {
+	"dijkstra_runs": "single source shortest path trees computed by the distance oracle",
+	"nearest_target_queries": "early stopping Dijkstra searches, trucks without an oracle",
+	"route_lookups": "next hop lookups of trucks on their way",
+	"fleet_sync_hits": "quotes served from a current insertion cost table",
+	"fleet_sync_partial": "insertion cost tables repriced for the trucks on repaired rows",
+	"fleet_sync_misses": "insertion cost tables rebuilt from scratch",
+	"offers_generated": "offers made by clients",
+	"offers_awarded": "offers won by a company",
+	"bids_requested": "bids asked from companies",
+	"bids_inf": "bids refused (inf): no money, full backlog or no truck",
+	"offers_dispatched": "pending offers put on a truck",
+	"offers_expired": "pending offers dropped after waiting offer_ttl ticks",
+	"offers_pending": "offers still waiting for a truck when the run ended",
+	"trucks_failed": "trucks sent back because no path was left to a stop, finalStep(-1)",
+	"trucks_replanned": "plans ordered again after a repair changed the distances between their stops",
+	"edges_exploded": "edges removed by edge explosions",
+	"trucks_exploded": "trucks lost in truck explosions",
+}
+GAUGES = ["offers_pending"]
+counters = dict.fromkeys(HELP, 0)
+
+def reset():
+	for name in counters:
+		counters[name] = 0
+
+def export(stem, **labels):
+	# appends this run's counters and labels to stem.jsonl, see write
+	with open(stem + ".jsonl", "a") as f:
+		f.write(json.dumps(dict(labels=labels, counters=counters)) + "\n")
+
+def write(stem):
+	# stem.prom from every run in stem.jsonl, for a Prometheus textfile
+	# collector: the counters of runs with the same labels (the simulation's
+	# and the sweep's parameters) add up and gauges are averaged over them.
+	# Called once by the process that ran the sweeps, the file is replaced atomically
+	if not os.path.exists(stem + ".jsonl"):
+		return
+	totals = dict() # labels -> [runs, counters]
+	with open(stem + ".jsonl") as f:
+		for line in f:
+			if not line.strip():
+				continue
+			run = json.loads(line)
+			key = tuple(sorted((k, str(v)) for k, v in run["labels"].items()))
+			total = totals.setdefault(key, [0, dict.fromkeys(HELP, 0)])
+			total[0] += 1
+			for name in HELP:
+				total[1][name] += run["counters"].get(name, 0)
+	lines = ["# HELP aasma_runs_total runs exported", "# TYPE aasma_runs_total counter"]
+	for key, (runs, sums) in totals.items():
+		lines.append(f"aasma_runs_total{{{tags(key)}}} {runs}")
+	for name in HELP:
+		metric = "aasma_" + name + ("" if name in GAUGES else "_total")
+		lines.append(f"# HELP {metric} {HELP[name]}")
+		lines.append(f"# TYPE {metric} {'gauge' if name in GAUGES else 'counter'}")
+		for key, (runs, sums) in totals.items():
+			lines.append(f"{metric}{{{tags(key)}}} {sums[name]/runs if name in GAUGES else sums[name]}")
+	tmp = f"{stem}.prom.{os.getpid()}"
+	with open(tmp, "w") as f:
+		f.write("\n".join(lines) + "\n")
+	os.replace(tmp, stem + ".prom")
+
+def tags(key):
+	return ",".join(f'{k}="{v}"' for k, v in key)
@@ -1,4 +1,9 @@
 #!/usr/bin/python
+import math
+import sys
+from collections import OrderedDict
+import metrics
+
 class Offer:
 	def __init__(self, target, quantity, timestamp):
 		self.quantity = quantity
@@ -21,4 +26,56 @@ class Offer:
 		return self.quantity
 
 	def getTimestamp(self):
-		return self.timestamp
\ No newline at end of file
+		return self.timestamp
+
+class OfferQueue:
+	# offers a company won but has not put on a truck yet, oldest first;
+	# max_pending caps the backlog (bids are refused while it is full) and
+	# offers waiting ttl ticks or more expire
+	def __init__(self, max_pending=None, ttl=None):
+		self.pending = OrderedDict() # key -> offer, by timestamp
+		self.next_key = 0
+		self.newest = -math.inf
+		self.max_pending = max_pending
+		self.ttl = ttl
+		self.expired = 0
+
+	def __repr__(self):
+		return f"OfferQueue with {len(self.pending)} offers"
+
+	def __len__(self):
+		return len(self.pending)
+
+	def __iter__(self):
+		return iter(self.pending.values())
+
+	def items(self):
+		return self.pending.items()
+
+	def push(self, offer):
+		self.pending[self.next_key] = offer
+		self.next_key += 1
+		if offer.timestamp < self.newest:
+			# offers arrive in timestamp order, this only happens if pushed by hand
+			self.pending = OrderedDict(sorted(self.pending.items(), key=lambda kv: kv[1].timestamp))
+		self.newest = max(self.newest, offer.timestamp)
+
+	def remove(self, key):
+		del self.pending[key]
+
+	def room(self):
+		return sys.maxsize if self.max_pending is None else self.max_pending - len(self.pending)
+
+	def full(self):
+		return self.room() <= 0
+
+	def expire(self, t):
+		if self.ttl is None:
+			return
+		while self.pending:
+			key, offer = next(iter(self.pending.items()))
+			if offer.timestamp > t - self.ttl:
+				return
+			self.pending.popitem(last=False)
+			self.expired += 1
+			metrics.counters["offers_expired"] += 1
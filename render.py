@@ -0,0 +1,117 @@
+#!/usr/bin/python
+import atexit
+import json
+import multiprocessing
+import os
+import traceback
+
+# Plots are drawn by a background process: experiments hand it a spec (the
+# curves and labels of a figure, plain data) and go on simulating. With an
+# output folder it draws with Agg and writes the figure in every format plus
+# the data it was drawn from (json), without one it shows it on screen
+formats = ["png"] # "png", "svg", "pdf"...
+
+def series(x, y, yerr=None, label=None, color=None):
+	return dict(x=x, y=y, yerr=yerr, label=label, color=color)
+
+def plot(title, xlabel, ylabel, curves, legend=None, data=None):
+	# legend - labels of the curves in order, None labels them with their own
+	return dict(kind="plot", title=title, xlabel=xlabel, ylabel=ylabel, series=curves, legend=legend, data=data)
+
+def graph(nodes, edges, colors, title="Graph"):
+	# edges - (u, v, weight); the spring layout is computed by the renderer
+	return dict(kind="graph", title=title, nodes=nodes, edges=edges, colors=colors, data=dict(edges=edges))
+
+def filename(title):
+	return title.lower().replace(" ", "-").replace("/", "-")
+
+def draw(spec, plt):
+	# draws a spec on a new figure of plt (matplotlib.pyplot)
+	plt.figure()
+	if spec["kind"] == "graph":
+		import networkx as nx
+		g = nx.Graph()
+		g.add_nodes_from(spec["nodes"])
+		g.add_weighted_edges_from(spec["edges"])
+		d = dict(nx.degree(g))
+		pos = nx.spring_layout(g)
+		colors = spec["colors"] if len(spec["colors"]) == len(d) else None
+		nx.draw(g, pos=pos, with_labels=True, nodelist=list(d), node_size=[(v+1) * 100 for v in d.values()], node_color=colors)
+		nx.draw_networkx_edge_labels(g, pos, edge_labels=nx.get_edge_attributes(g, "weight"))
+		return
+	plt.title(spec["title"])
+	plt.xlabel(spec["xlabel"])
+	plt.ylabel(spec["ylabel"])
+	for s in spec["series"]:
+		plt.errorbar(s["x"], s["y"], yerr=s["yerr"], label=s["label"], color=s["color"])
+	if spec["legend"] is not None:
+		plt.legend(spec["legend"])
+	else:
+		plt.legend()
+
+def save(spec, output, formats, plt):
+	os.makedirs(output, exist_ok=True)
+	name = os.path.join(output, filename(spec["title"]))
+	for f in formats:
+		plt.savefig(name + "." + f)
+	plt.close()
+	if spec.get("data") is not None:
+		with open(name + ".json", "w") as f:
+			json.dump(dict(spec["data"], title=spec["title"]), f, default=lambda o: o.tolist())
+
+def loop(queue, headless):
+	# the renderer process: draws specs until it gets None
+	import matplotlib
+	if headless:
+		matplotlib.use("Agg")
+	import matplotlib.pyplot as plt
+	for spec, output, formats in iter(queue.get, None):
+		try:
+			draw(spec, plt)
+			if output is None:
+				plt.show()
+			else:
+				save(spec, output, formats, plt)
+		except Exception:
+			# a plot that can't be drawn doesn't take the others with it
+			traceback.print_exc()
+			plt.close("all")
+
+class Renderer(object):
+	# owns the renderer process, started by the first plot; it is spawned, not
+	# forked, so that it never inherits the simulation's state or a GUI backend
+	def __init__(self):
+		self.process = None
+		self.headless = None
+
+	def __repr__(self):
+		return f"Renderer {'running' if self.process is not None else 'stopped'}"
+
+	def submit(self, spec, output=None):
+		headless = output is not None
+		if self.process is not None and (self.headless != headless or not self.process.is_alive()):
+			self.close()
+		if self.process is None:
+			ctx = multiprocessing.get_context("spawn")
+			self.queue = ctx.Queue()
+			self.headless = headless
+			self.process = ctx.Process(target=loop, args=(self.queue, headless), daemon=True)
+			self.process.start()
+			# after start: multiprocessing's own exit handler, which kills daemon
+			# processes, is registered by the first start and atexit runs last first
+			atexit.unregister(self.close)
+			atexit.register(self.close)
+		self.queue.put((spec, output, list(formats)))
+
+	def close(self):
+		# waits for every plot submitted so far
+		if self.process is None:
+			return
+		self.queue.put(None)
+		self.process.join()
+		self.process = None
+
+renderer = Renderer()
+
+def submit(spec, output=None):
+	renderer.submit(spec, output)
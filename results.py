@@ -0,0 +1,98 @@
+#!/usr/bin/python
+import json
+import os
+import numpy as np
+
+class ResultStore(object):
+	# test results of sweeps on disk instead of in RAM: every array is appended
+	# to one raw float64 file, series.f8, and indexed by index.jsonl, one line
+	# per array with its point (payload digest), test, sweep parameters, offset
+	# and shape. Reads map the file, the tests of a point stored one after the
+	# other come back as a single (tests, ...) view without being copied
+	def __init__(self, path):
+		self.path = path
+		self.data = os.path.join(path, "series.f8")
+		self.index = os.path.join(path, "index.jsonl")
+		self.entries = []
+		self.keys = dict() # (digest, test) -> position in entries
+		self.size = 0 # float64 values in data
+		self.mapped = None
+		os.makedirs(path, exist_ok=True)
+		self.load()
+
+	def __repr__(self):
+		return f"ResultStore at {self.path} with {len(self.entries)} arrays"
+
+	def __len__(self):
+		return len(self.entries)
+
+	def load(self):
+		# an array is written before its index line, so a run stopped halfway
+		# leaves at most a block nobody points to (dropped) or half a line (ignored)
+		if not os.path.exists(self.index):
+			return
+		lines = open(self.index).read().split("\n")
+		for line in lines:
+			try:
+				entry = json.loads(line)
+			except ValueError:
+				continue
+			self.keys[entry["point"], entry["test"]] = len(self.entries)
+			self.entries.append(entry)
+			self.size = max(self.size, entry["offset"] + int(np.prod(entry["shape"])))
+		if lines[-1] != "":
+			with open(self.index, "w") as f:
+				f.writelines(json.dumps(e) + "\n" for e in self.entries)
+		if os.path.exists(self.data) and os.path.getsize(self.data) > 8*self.size:
+			os.truncate(self.data, 8*self.size)
+
+	def append(self, digest, test, array, params=None):
+		a = np.ascontiguousarray(array, dtype=np.float64)
+		with open(self.data, "ab") as f:
+			f.write(a.tobytes())
+		entry = dict(point=digest, test=test, offset=self.size, shape=list(a.shape), params=params or dict())
+		with open(self.index, "a") as f:
+			f.write(json.dumps(entry) + "\n")
+		self.keys[digest, test] = len(self.entries)
+		self.entries.append(entry)
+		self.size += a.size
+
+	def clear(self):
+		# starts over, the arrays stored so far are deleted
+		for path in [self.data, self.index]:
+			if os.path.exists(path):
+				os.remove(path)
+		self.entries = []
+		self.keys = dict()
+		self.size = 0
+		self.mapped = None
+
+	def has(self, digest, test):
+		return (digest, test) in self.keys
+
+	def map(self):
+		if self.mapped is None or len(self.mapped) < self.size:
+			self.mapped = np.memmap(self.data, dtype=np.float64, mode="r", shape=(self.size,))
+		return self.mapped
+
+	def view(self, entry):
+		n = int(np.prod(entry["shape"]))
+		return self.map()[entry["offset"]:entry["offset"]+n].reshape(entry["shape"])
+
+	def get(self, digest, test):
+		return self.view(self.entries[self.keys[digest, test]])
+
+	def block(self, digest, tests):
+		# the tests 0..tests-1 of a point as one (tests, ...) array, a view of
+		# the file when they are stored contiguously, stacked otherwise
+		entries = [self.entries[self.keys[digest, i]] for i in range(tests)]
+		shape = entries[0]["shape"]
+		n = int(np.prod(shape))
+		if all(e["shape"] == shape and e["offset"] == entries[0]["offset"] + i*n for i, e in enumerate(entries)):
+			start = entries[0]["offset"]
+			return self.map()[start:start+tests*n].reshape([tests] + shape)
+		return np.stack([self.view(e) for e in entries])
+
+	def select(self, **params):
+		# entries whose sweep parameters include params, for looking at a store by hand
+		return [e for e in self.entries if all(e["params"].get(k) == v for k, v in params.items())]
@@ -1,13 +1,21 @@
-import networkx as nx
-import matplotlib.pylab as plt
 from random import *
+import math
 import numpy as np
-import copy
 import gc
+import json
+import os
 import graph_utils
-from company import *
-from truck import *
-from client import *
+import metrics
+import render
+from distance_oracle import DistanceOracle
+from events import EventEngine, Arrivals
+from timing import PhaseTimer, EVENTS, MARKET, GAME_OVER, COMPANIES
+from sweep import Sweep, Shared, loadPoint
+from checkpoint import Checkpoint
+from company import Company
+from truck import Truck
+from client import Client
+from demand import Demand
 
 class Simulation(object):
 				
@@ -15,8 +23,10 @@ class Simulation(object):
 		n_nodes=15, graph_type="random", graph_param=0.2, graph_min_weight=1, graph_max_weight=10,
 		n_companies=5, n_trucks=7, 
 		truck_threshold=100, company_init_money=2500, uni_cost=1, profit_margin=1.5, tax=0.05,
-		risk=(randint(1,99)/100), min_offer_val=25, max_offer_val=80,
-		existence_tax=0.05, p_edge_explosion=0.0, p_truck_explosion=0.0):
+		risk=None, min_offer_val=25, max_offer_val=80,
+		existence_tax=0.05, p_edge_explosion=0.0, p_truck_explosion=0.0,
+		seed=None, engine="tick", max_pending=50, offer_ttl=20, profile=False, metrics=None,
+		graph_backend="networkx", demand="clients", clients_per_node=1):
 
 		# network params
 		self.n_nodes = n_nodes
@@ -24,6 +34,8 @@ class Simulation(object):
 		self.graph_param = graph_param
 		self.graph_min_weight = graph_min_weight
 		self.graph_max_weight = graph_max_weight
+		# "networkx" or "csr", a graph_backend.CSRGraph (paths through scipy)
+		self.graph_backend = graph_backend
 		
 		# agents params
 		self.n_companies = n_companies
@@ -35,9 +47,15 @@ class Simulation(object):
 		self.uni_cost = uni_cost
 		self.profit_margin = profit_margin
 		self.tax = tax
+		# backlog of offers won but not on a truck yet and the ticks an offer may
+		# wait in it, see offer.OfferQueue; None leaves them unbounded
+		self.max_pending = max_pending
+		self.offer_ttl = offer_ttl
 
 		# client params
-		self.risk = risk
+		# random if None, drawn here: a default argument is drawn once, at import,
+		# before anything could seed it
+		self.risk = risk if risk is not None else randint(1,99)/100
 		# self.utilities = utilities
 		self.min_offer_val = min_offer_val
 		self.max_offer_val = max_offer_val
@@ -47,21 +65,46 @@ class Simulation(object):
 		self.p_edge_explosion = p_edge_explosion
 		self.p_truck_explosion = p_truck_explosion		
 
+		# replicates are seeded from it, random if None
+		self.seed = seed
+		# "tick" visits every agent every tick, "event" jumps between events
+		# (see events.py) and trucks take the weight of an edge to travel it
+		self.engine = engine
+		# times the phases of every tick (see timing.py) when True, and also
+		# appends a report of each run to the file when it is a path
+		self.profile = profile
+		self.timer = None
+		# path stem the counters of every run are exported to (see metrics.py),
+		# labelled with the parameters of the simulation and of the sweep point
+		self.metrics = metrics
+		self.labels = dict()
+		# "clients" makes a Client per node, "aggregate" one demand.Demand for
+		# all of them (arrays instead of objects, for very large graphs) where
+		# each node may stand for clients_per_node clients
+		self.demand = demand
+		self.clients_per_node = clients_per_node
+
 		self.completedOffers = 0
+		self.money_std = None
+		self.oracle = None
+		self.removed_edges = [] # (u, v, weight), put back by restore
 
 	def build_graph(self):
 		if self.graph_type == "random":
-			return graph_utils.generate_weighted_random_graph(
+			g = graph_utils.generate_weighted_random_graph(
 				n=self.n_nodes, 
 				p=self.graph_param,
 				min_weight=self.graph_min_weight, 
-				max_weight=self.graph_max_weight)
+				max_weight=self.graph_max_weight,
+				backend=self.graph_backend)
 		elif self.graph_type == "scale-free":
-			return graph_utils.generate_weighted_barabasi_graph(
+			g = graph_utils.generate_weighted_barabasi_graph(
 				n=self.n_nodes, 
 				m=self.graph_param,
 				min_weight=self.graph_min_weight, 
-				max_weight=self.graph_max_weight)
+				max_weight=self.graph_max_weight,
+				backend=self.graph_backend)
+		return g
 
 	def generate_companies(self, graph, numCompanies=False):
 		company_names = ["A", "B", "C", "D","E","F","G","H","I","J","K"]
@@ -71,7 +114,9 @@ class Simulation(object):
 						uni_cost=self.uni_cost,
 						truck_threshold=self.truck_threshold,
 						profit_margin=self.profit_margin,
-						tax=self.tax)) for i,x in enumerate(companies)]
+						tax=self.tax,
+						max_pending=self.max_pending,
+						offer_ttl=self.offer_ttl)) for i,x in enumerate(companies)]
 		if numCompanies:
 			graph_utils.set_ncompany_nodes(graph, companies)
 		else:
@@ -87,21 +132,32 @@ class Simulation(object):
 		return list(pref/sum(pref))
 
 	def generate_clients(self, graph, companies):
+		if self.demand == "aggregate":
+			nodes = [n for n in graph.nodes if "company" not in graph.nodes[n]]
+			# calculateUtilities for every node at once
+			rng = np.random.default_rng(getrandbits(64))
+			pref = rng.integers(1, 99, size=(len(nodes), len(companies)), endpoint=True)/100
+			return Demand(nodes, [c[1] for c in companies], self.risk, pref/pref.sum(axis=1, keepdims=True),
+				clients=self.clients_per_node, min_offer_val=self.min_offer_val, max_offer_val=self.max_offer_val)
 		return [Client(n, 
 					[c[1] for c in companies],
 					risk=self.risk,
 					utilities=self.calculateUtilities(),
 					min_offer_val=self.min_offer_val, 
-					max_offer_val=self.max_offer_val) for n in graph.nodes if "company" not in graph.node[n]]
+					max_offer_val=self.max_offer_val) for n in graph.nodes if "company" not in graph.nodes[n]]
 
 	def do_edge_explosion(self, t, graph):
 		try:
-			e = choice(list(graph.edges()))
+			# sorted, re-added edges would otherwise change the draw
+			e = choice(sorted(graph.edges()))
+			self.removed_edges.append((e[0], e[1], graph[e[0]][e[1]]["weight"]))
 			graph.remove_edge(e[0],e[1])
 		except Exception as e:
 			if verbosity_events:
 				print(f"\tall edges removed t= {t}\t")
 			return
+		self.oracle.remove_edge(e[0], e[1])
+		metrics.counters["edges_exploded"] += 1
 		if verbosity_events:	
 			print(f"\tedge removed:\t {e[0]} -- {e[1]} (t={t})")
 
@@ -113,6 +169,7 @@ class Simulation(object):
 			if verbosity_events:
 				print(f"\tNo more trucks t= {t}\t")
 			return
+		metrics.counters["trucks_exploded"] += 1
 		if verbosity_events:	
 			print(f"\tTruck from \t {c[1].pos} exploded (t={t})")
 
@@ -120,87 +177,220 @@ class Simulation(object):
 		if verbosity_companies:
 			print(f"GAME OVER FOR {company[1]} at t={t} -- offers={company[1].completedOffers}")
 		companies.remove(company)
-		# del graph.node[company[0]]['company']
+		# del graph.nodes[company[0]]['company']
 		# graph_utils.colormap[company[0]]= "#%06x" % 0xDDDDDD
 		return company[1]
 
-	def generateMoneyPerCompany(self):
-		# generates a list of lists (a list per company) to keep track of all companies' money
-		money_per_company = []
-		for _ in range(self.n_companies):
-			money_per_company.append([])
-			
-		for _ in range(iterations):
-			for m in money_per_company:
-				m.append(0)
-		return money_per_company
+	def awardOffers(self, offers, bidders, companies, utilities=None):
+		# utilities - offers x companies, taken from the bidders when None
+		active = [c[1] for c in companies]
+		targets = np.array([o.getTarget() for o in offers])
+		quantities = np.array([o.getQuantity() for o in offers])
+		bids = np.array([c.getBids(targets, quantities) for c in active]).T
+		metrics.counters["offers_generated"] += len(offers)
+		metrics.counters["bids_requested"] += bids.size
+		metrics.counters["bids_inf"] += int(np.isinf(bids).sum())
+		if utilities is None:
+			utilities = np.array([cli.utilities[:len(active)] for cli in bidders])
+		with np.errstate(invalid="ignore"):
+			weighted = (1 - utilities)*bids
+		# like Client.chooseBestBid, a 0*inf weighted bid voids the offer
+		pending = ~np.isnan(weighted).any(axis=1)
+		awarded = np.zeros(len(offers), dtype=bool)
+		winners = np.zeros(len(offers), dtype=np.int64)
+		room = [c.offers.room() for c in active]
+		while pending.any():
+			rows = np.flatnonzero(pending)
+			best = weighted[rows].argmin(axis=1)
+			ok = (weighted[rows, best] != math.inf) & (bids[rows, best] != math.inf)
+			pending[rows[~ok]] = False
+			rows, best = rows[ok], best[ok]
+			for j in np.unique(best):
+				# a company does not take more offers than its backlog has room
+				# for, the rest go to their next best bidder
+				mine = rows[best == j]
+				taken = mine[:max(room[j], 0)]
+				winners[taken] = j
+				awarded[taken] = True
+				pending[taken] = False
+				room[j] -= len(taken)
+				if len(taken) < len(mine):
+					weighted[:, j] = math.inf
+		prices = bids[np.arange(len(offers)), winners]
+
+		metrics.counters["offers_awarded"] += int(awarded.sum())
+		taxed = np.bincount(winners[awarded], weights=prices[awarded], minlength=len(active))
+		won = [[] for _ in active]
+		for k in np.flatnonzero(awarded):
+			offers[k].setValue(prices[k])
+			won[winners[k]].append(offers[k])
+		for j, c in enumerate(active):
+			if won[j] != []:
+				c.setOffers(won[j], taxed[j])
 
-	def drawPlot(self, y_data, x_data, title, xlabel, ylabel, legend, per=0.2, color="red"):
-		# Draws the basic plot
-		plt.figure()
-		plt.title(title)
-		plt.xlabel(xlabel)
-		plt.ylabel(ylabel)
-		error = per * np.array(x_data)
-		plt.errorbar(x=y_data, y=x_data, yerr=error, color=color)
-		plt.legend(legend[0])
-		plt.show()
-
-	def testCicle(self, g, money_per_company, companies, cpy_companies, clients, truckExp=False):
-		# cicle for "tests" times, and does the mean for all the values
-		for cli in clients:
-				cli.setCompanies([c[1] for c in cpy_companies])
-		for i in range(tests):
-			if verbosity:
-				print(f"\n\n\nITERATION {i}\n\n\n")
-			mc = self.run(g.copy(), list(cpy_companies), list(clients), iterations)
-			for i in range(len(mc)):
-				money_per_company[i] = list(np.array(money_per_company[i]) + np.array(mc[i]))
-			if truckExp:
-				self.generate_trucks(g, companies)
-			cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
+	def generateMoneyPerCompany(self):
+		# one row per company to keep track of all companies' money
+		return np.zeros((self.n_companies, iterations))
+
+	def drawPlot(self, y_data, x_data, title, xlabel, ylabel, legend, per=0.2, color="red", output=None):
+		# Draws the basic plot, in the background (see render.py)
+		error = per * np.abs(np.array(x_data))
+		render.submit(render.plot(title, xlabel, ylabel, [render.series(y_data, x_data, error, color=color)], legend=legend[0],
+			data=dict(x=y_data, y=x_data, legend=legend)), output)
+
+	def replicateSeed(self):
+		# base seed of the tests of a simulation or of a whole sweep
+		return self.seed if self.seed is not None else getrandbits(64)
+
+	def snapshot(self, companies, tables):
+		# the state a run changes: companies' money, offers and trucks, and the
+		# distance tables (an oracle's getState); the graph itself is repaired
+		# from removed_edges
+		return (list(companies), [c[1].getState() for c in companies], tables)
+
+	def restore(self, state, g, oracle, clients):
+		# puts the world back as it was at the snapshot, returns its companies
+		companies, agents, tables = state
+		for u, v, weight in self.removed_edges:
+			g.add_edge(u, v, weight=weight)
+		self.removed_edges = []
+		oracle.setState(tables)
+		for c, agent in zip(companies, agents):
+			c[1].setState(agent)
+		if isinstance(clients, Demand):
+			clients.setCompanies([c[1] for c in companies])
+		else:
 			for cli in clients:
-				cli.setCompanies([c[1] for c in cpy_companies])
-		for mc in money_per_company:
-			mc = np.array(mc)/tests
+				cli.setCompanies([c[1] for c in companies])
+		return list(companies)
+
+	def sweepPoint(self, base_seed, g, companies, clients):
+		# everything the tests of a sweep point need, see runSweepTask; the
+		# workers build the oracle from the tables of the snapshot
+		self.oracle = None
+		return (self, g, clients, self.snapshot(companies, self.distanceTables(g)), iterations, base_seed)
+
+	def distanceTables(self, g):
+		# the oracle state of g, computed once per graph and shipped once per
+		# sweep for all the points on it
+		if id(g) not in graphTables or graphTables[id(g)][0] is not g:
+			graphTables.clear()
+			graphTables[id(g)] = (g, Shared(DistanceOracle(g).getState()))
+		return graphTables[id(g)][1]
+
+	def reduceTests(self, results):
+		# (mean, std) over the tests of each company's money at each iteration;
+		# results from a store are already one (tests, companies, iterations) array
+		money = results if isinstance(results, np.ndarray) else np.stack(results)
+		return money.mean(axis=0), money.std(axis=0)
+
+	def testCicle(self, g, money_per_company, companies, clients):
+		# cicle for "tests" times, and does the mean for all the values
+		sweep = Sweep(runSweepTask, workers, store)
+		sweep.add(self.sweepPoint(self.replicateSeed(), g, companies, clients), tests)
+		money_per_company[:], self.money_std = self.reduceTests(sweep.run()[0])
 		return money_per_company
 
-	def run(self, g, companies, clients, iterations):
-		money_per_company = []
+	def run(self, g, companies, clients, iterations, oracle=None, checkpoint=None):
+		# checkpoint - a checkpoint.Checkpoint: the run is saved every so many ticks
+		# and, when the file is there, goes on from it with the objects saved in it
+		if checkpoint is not None and self.engine == "event":
+			raise ValueError("checkpoints are only taken by the tick engine")
+		if isinstance(clients, Demand):
+			if self.engine == "event":
+				raise ValueError("aggregated demand is only run by the tick engine")
+			clients.reset()
 		self.completedOffers = 0
-		dict_companies = dict([])
-		for i in range(len(companies)):
-			money_per_company.append([])
-			dict_companies[companies[i][1]] = i
+		self.oracle = oracle if oracle is not None else DistanceOracle(g)
+		for c in companies:
+			c[1].setOracle(self.oracle)
+		self.timer = PhaseTimer(iterations) if self.profile else None
+		metrics.reset()
+		if self.engine == "event":
+			money_per_company = EventEngine(self, g, companies, clients, iterations).run()
+		else:
+			money_per_company = self.runTicks(g, companies, clients, iterations, checkpoint)
+		if isinstance(self.profile, str):
+			self.timer.write(self.profile, engine=self.engine, n_nodes=self.n_nodes, n_companies=self.n_companies,
+				n_trucks=self.n_trucks, clients=len(clients))
+		if self.metrics is not None:
+			metrics.counters["offers_pending"] = sum(len(c[1].offers) for c in companies)
+			metrics.export(self.metrics, **dict(dict(engine=self.engine, n_nodes=self.n_nodes, n_companies=self.n_companies,
+				n_trucks=self.n_trucks, clients=len(clients)), **self.labels))
+		return money_per_company
 
-		for _ in range(iterations):
-			for m in money_per_company:
-				m.append(0)
+	def saveRun(self, checkpoint, i, g, companies, clients, money_per_company, dict_companies, arrivals):
+		# everything the ticks after i depend on, in one pickle so that the
+		# objects shared by the graph, companies, trucks and clients stay shared
+		checkpoint.save((i, g, companies, clients, self.oracle, money_per_company, dict_companies, arrivals,
+			self.removed_edges, self.completedOffers, dict(metrics.counters), getstate()))
+
+	def runTicks(self, g, companies, clients, iterations, checkpoint=None):
+		timer = self.timer
+		demand = isinstance(clients, Demand)
+		state = checkpoint.load() if checkpoint is not None else None
+		if state is None:
+			start = 0
+			money_per_company = np.zeros((len(companies), iterations))
+			dict_companies = dict([])
+			for i in range(len(companies)):
+				dict_companies[companies[i][1]] = i
+			# clients' offers and explosions happen at drawn ticks, see events.Arrivals
+			arrivals = Arrivals(self, [] if demand else clients, iterations)
+		else:
+			(i, g, companies, clients, self.oracle, money_per_company, dict_companies, arrivals,
+				self.removed_edges, self.completedOffers, counters, rng) = state
+			metrics.counters.update(counters)
+			setstate(rng)
+			start = i + 1
 
-		for i in range(iterations):
+		for i in range(start, iterations):
 			if len(companies) == 0:
+				if checkpoint is not None:
+					checkpoint.clear()
 				return money_per_company
+			if timer is not None:
+				timer.tick(i)
 
-			if (randint(1,99)/100) < self.p_edge_explosion:
+			edge, truck, firing = arrivals.pop(i)
+			if edge:
 				self.do_edge_explosion(i, g)
 			
-			if (randint(1,99)/100) < self.p_truck_explosion:
+			if truck:
 				self.do_truck_explosion(i, g, companies)
-
-			for cli in clients:
-				cli.go(i)
+			if timer is not None:
+				timer.mark(EVENTS)
+
+			if demand:
+				offers, rows = clients.draw(i)
+				if offers != []:
+					self.awardOffers(offers, None, companies, clients.utilitiesOf(rows))
+			elif firing != []:
+				bidders = [clients[k] for k in firing]
+				self.awardOffers([cli.makeOffer(i) for cli in bidders], bidders, companies)
+			if timer is not None:
+				timer.mark(MARKET)
 
 			for c in companies:
 				if c[1].money <= 0:
 					self.completedOffers += c[1].getCompletedOffers()
 					company_gameover = self.do_game_over(companies, c, g, i)
-					for cli in clients:
-						cli.removeCompany(company_gameover)
+					if demand:
+						clients.removeCompany(company_gameover)
+					else:
+						for cli in clients:
+							cli.removeCompany(company_gameover)
+					if timer is not None:
+						timer.mark(GAME_OVER)
 					continue
 
 				c[1].money -= self.company_init_money*self.existence_tax # impostos por existencia
 				c[1].go(g, i)
-				money_per_company[dict_companies[c[1]]][i] = c[1].money
+				money_per_company[dict_companies[c[1]], i] = c[1].money
+				if timer is not None:
+					timer.mark(COMPANIES)
+			if checkpoint is not None and checkpoint.due(i):
+				self.saveRun(checkpoint, i, g, companies, clients, money_per_company, dict_companies, arrivals)
 
 		for c in companies:
 			if verbosity_companies:
@@ -209,54 +399,78 @@ class Simulation(object):
 
 		if verbosity_companies:
 			print(f"OFFERS COMPLETED: {self.completedOffers}")
+		if checkpoint is not None:
+			checkpoint.clear()
 		return money_per_company
 
+def runSweepTask(task):
+	# one test of a sweep point, module level so that worker processes can run
+	# it; the point is restored before each test
+	digest, i = task
+	(s, g, clients, state, iterations, base_seed), params = loadPoint(digest)
+	s.labels = params
+	if verbosity:
+		print(f"\n\n\nITERATION {i}\n\n\n")
+	# the tests of a point share its oracle, restore fills it with the point's
+	# tables (a test resumed from a checkpoint ran on the oracle saved in it)
+	oracle = s.oracle if s.oracle is not None and s.oracle.graph is g else DistanceOracle(g, build=False)
+	companies = s.restore(state, g, oracle, clients)
+	seed(f"{base_seed}-{i}")
+	checkpoint = None
+	if checkpoints is not None and s.engine == "tick":
+		checkpoint = Checkpoint(os.path.join(checkpoints, f"{digest}-{i}.ckpt"), checkpointEvery)
+	return s.run(g, companies, clients if isinstance(clients, Demand) else list(clients), iterations, oracle, checkpoint)
+
 class SimulationObject(object):
 	def __init__(self, type):
 		self.type = type
 		self.graph_param = 0.2 if self.type=="random" else 2
+		# Simulation arguments overriding the experiment's own
+		self.params = dict()
+		# folder for plots and their data, None shows them on screen
+		self.output = None
+
+	def simulation(self, **kwargs):
+		kwargs = dict(dict(graph_type=self.type, graph_param=self.graph_param), **kwargs)
+		kwargs.update(self.params)
+		return Simulation(**kwargs)
+
+	def drawGraph(self, g):
+		render.submit(graph_utils.graph_spec(g), self.output)
 		
 class MoneyTime(SimulationObject):
-	def drawPlot(self, x_data, title, xlabel, ylabel, legend):
-		plt.figure()
-		plt.title(title)
-		plt.xlabel(xlabel)
-		plt.ylabel(ylabel)
+	def drawPlot(self, x_data, title, xlabel, ylabel, legend, error=None):
+		curves = []
 		for i in range(len(x_data)):
-			error = 0.05 * np.array(x_data[i])
-			plt.errorbar(list(range(len(x_data[i]))), x_data[i], yerr=error, label="Company "+legend[i][1]+" pos:"+str(legend[i][2]), color=legend[i][0])
-		plt.legend()
-		plt.show()
+			yerr = error[i] if error is not None else 0.05 * np.abs(np.array(x_data[i]))
+			curves.append(render.series(list(range(len(x_data[i]))), x_data[i], yerr, label="Company "+legend[i][1]+" pos:"+str(legend[i][2]), color=legend[i][0]))
+		render.submit(render.plot(title, xlabel, ylabel, curves, data=dict(y=x_data, legend=legend)), self.output)
 
 	def run(self):
-		s = Simulation(graph_type=self.type, graph_param=self.graph_param)	
+		s = self.simulation()
 		g = s.build_graph()
 		companies = s.generate_companies(g)
 		s.generate_trucks(g, companies)
-		graph_utils.draw_graph(g)
+		self.drawGraph(g)
 		#graph_utils.show_graphs()
-		cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
-		clients = s.generate_clients(g, cpy_companies)
-		money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
+		clients = s.generate_clients(g, companies)
+		money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, clients)
 		gc.collect()
 		legend = [(graph_utils.colormap[c[0]], c[1].name, c[1].pos) for c in companies]
-		self.drawPlot(money_per_company, "Money vs Time", "Time", "Money", legend)
+		self.drawPlot(money_per_company, "Money vs Time", "Time", "Money", legend, error=s.money_std)
 
 class GraphTypes(SimulationObject):
 	def drawPlot(self, y_data, random_type, scale_free_type, title, xlabel, ylabel, legend):
-		plt.title(title)
-		plt.xlabel(xlabel)
-		plt.ylabel(ylabel)
-		error_random = 0.05 * np.array(random_type)
-		error_scale_free = 0.05 * np.array(scale_free_type)
-		plt.errorbar(y_data, random_type, yerr=error_random, label=legend[0], color="red")
-		plt.errorbar(y_data, scale_free_type, yerr=error_scale_free, label=legend[1], color="blue")
-		plt.legend()
-		plt.show()
+		error_random = 0.05 * np.abs(np.array(random_type))
+		error_scale_free = 0.05 * np.abs(np.array(scale_free_type))
+		curves = [render.series(y_data, random_type, error_random, label=legend[0], color="red"),
+			render.series(y_data, scale_free_type, error_scale_free, label=legend[1], color="blue")]
+		render.submit(render.plot(title, xlabel, ylabel, curves, data=dict(x=y_data, random=random_type, scale_free=scale_free_type, legend=legend)), self.output)
 
 	def run(self):
-		s = Simulation(graph_type=self.type, graph_param=self.graph_param)
-		all_costs = []
+		s = self.simulation()
+		sweep = Sweep(runSweepTask, workers, store)
+		base_seed = s.replicateSeed()
 		for tipo in range(2):
 			if tipo==1:
 				s.graph_type = "scale-free"
@@ -264,126 +478,130 @@ class GraphTypes(SimulationObject):
 			g = s.build_graph()
 			companies = s.generate_companies(g)
 			s.generate_trucks(g, companies)
-			cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
-			clients = s.generate_clients(g, cpy_companies)
-			money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
+			clients = s.generate_clients(g, companies)
+			sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests, params=dict(graph_type=s.graph_type))
+		all_costs = []
+		for results in sweep.run():
+			money_per_company = s.reduceTests(results)[0]
 			maximum = [i[-1] for i in money_per_company]
 			all_costs.append(money_per_company[maximum.index(max(maximum))])
-			gc.collect()
+		gc.collect()
 		legend = ["Random Network", "Scale-Free Network"]
 		self.drawPlot(list(range(iterations)), all_costs[0], all_costs[1], "Graph Types", "Time", "Money", legend)
 
 class NumCompanies(SimulationObject):
 	def run(self):
-		s = Simulation(n_nodes=30, graph_type=self.type, graph_param=self.graph_param)
+		s = self.simulation(n_nodes=30)
 		g = s.build_graph()
-		values_ncomps = []
+		sweep = Sweep(runSweepTask, workers, store)
+		base_seed = s.replicateSeed()
 		list_len_companies = list(range(1,11))
 		for n_companies in list_len_companies:
 			s.n_companies = n_companies
 			companies = s.generate_companies(g, True)
 			s.generate_trucks(g, companies)
-			cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
-			clients = s.generate_clients(g, cpy_companies)
-			money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
+			clients = s.generate_clients(g, companies)
+			sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests, params=dict(n_companies=n_companies))
 			for c in companies:
-				del g.node[c[0]]['company']
-			maximum = [i[-1] for i in money_per_company]
+				del g.nodes[c[0]]['company']
+		values_ncomps = []
+		for results in sweep.run():
+			maximum = [i[-1] for i in s.reduceTests(results)[0]]
 			values_ncomps.append(max(maximum))
-			gc.collect()
+		gc.collect()
 
 		legend = [["Company w/ most profit"]]
-		s.drawPlot(list_len_companies, values_ncomps, "Number of Companies", "Number of Companies", "Money", legend, per=0.05)
+		s.drawPlot(list_len_companies, values_ncomps, "Number of Companies", "Number of Companies", "Money", legend, per=0.05, output=self.output)
 
 class NumNodes(SimulationObject):
 	def drawPlot(self, y_data, trucks8, trucks16, title, xlabel, ylabel, legend):
-		plt.title(title)
-		plt.xlabel(xlabel)
-		plt.ylabel(ylabel)
-		error_truck8 = 0.05 * np.array(trucks8)
-		error_truck16 = 0.05 * np.array(trucks16)
-		plt.errorbar(y_data, trucks8, yerr=error_truck8, label=legend[0], color="red")
-		plt.errorbar(y_data, trucks16, yerr=error_truck16, label=legend[1], color="blue")
-		plt.legend()
-		plt.show()
+		error_truck8 = 0.05 * np.abs(np.array(trucks8))
+		error_truck16 = 0.05 * np.abs(np.array(trucks16))
+		curves = [render.series(y_data, trucks8, error_truck8, label=legend[0], color="red"),
+			render.series(y_data, trucks16, error_truck16, label=legend[1], color="blue")]
+		render.submit(render.plot(title, xlabel, ylabel, curves, data=dict(x=y_data, trucks8=trucks8, trucks16=trucks16, legend=legend)), self.output)
 
 	def run(self):
-		s = Simulation(graph_type=self.type, graph_param=self.graph_param)
+		s = self.simulation()
+		sweep = Sweep(runSweepTask, workers, store)
+		base_seed = s.replicateSeed()
 		list_nodes = list(range(10,205,5))
 		for trucks in range(8,17,8):
 			s.n_trucks = trucks
-			all_costs = []
 			for nodes in list_nodes:
 				s.n_nodes = nodes
 				g = s.build_graph()
 				companies = s.generate_companies(g, True)
 				s.generate_trucks(g, companies)
-				cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
-				clients = s.generate_clients(g, cpy_companies)
-				money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
-				maximum = [i[-1] for i in money_per_company]
-				all_costs.append(max(maximum))
-				gc.collect()
-			if trucks==8:
-				trucks8 = all_costs
-			else:
-				trucks16 = all_costs
+				clients = s.generate_clients(g, companies)
+				# bigger graphs and fleets first, they are the slowest tests
+				sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests, cost=nodes*trucks, params=dict(n_trucks=trucks, n_nodes=nodes))
+		all_costs = []
+		for results in sweep.run():
+			maximum = [i[-1] for i in s.reduceTests(results)[0]]
+			all_costs.append(max(maximum))
+		gc.collect()
+		trucks8 = all_costs[:len(list_nodes)]
+		trucks16 = all_costs[len(list_nodes):]
 		legend = ["Number of Trucks: 8", "Number of Trucks: 16"]
 		self.drawPlot(list_nodes, trucks8, trucks16, "Number of Nodes/Number of trucks", "Number of Nodes", "Money", legend)
 
 class Threshold(SimulationObject):
 	def run(self):
-		s = Simulation(graph_type=self.type, graph_param=self.graph_param)
+		s = self.simulation()
 		g = s.build_graph()
 		companies = s.generate_companies(g)
 		s.generate_trucks(g, companies)
-		cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
-		clients = s.generate_clients(g, cpy_companies)
-		values_per_threshold = []	
+		clients = s.generate_clients(g, companies)
+		sweep = Sweep(runSweepTask, workers, store)
+		base_seed = s.replicateSeed()
 		limits = list(range(0,325,25))		
 		for threshold in limits:
 			s.truck_threshold = threshold
 			graph_utils.colormap = []
 			for c in companies:
 				c[1].setTruckThreshold(threshold)
-			money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
+			sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests, params=dict(truck_threshold=threshold))
+		values_per_threshold = []	
+		for results in sweep.run():
+			money_per_company = s.reduceTests(results)[0]
 			maximum = [i[-1] for i in money_per_company]
 			values_per_threshold.append(money_per_company[maximum.index(max(maximum))][-1])
-			gc.collect()
+		gc.collect()
 		legend = [["Company w/ most profit"]]
-		s.drawPlot(limits, values_per_threshold, "Threshold", "Threshold", "Money", legend, per=0.05)
+		s.drawPlot(limits, values_per_threshold, "Threshold", "Threshold", "Money", legend, per=0.05, output=self.output)
 
 class Explosion(SimulationObject):
 	def __init__(self,  type, edge=False):
 		self.edge = edge
-		super().__init__(graphType)
+		super().__init__(type)
 
 	def run(self):
-		s = Simulation(graph_type=self.type, graph_param=self.graph_param)
+		s = self.simulation()
 		g = s.build_graph()
 		companies = s.generate_companies(g)
 		s.generate_trucks(g, companies)
-		cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
-		clients = s.generate_clients(g, cpy_companies)
-		values_per_exp = []
+		clients = s.generate_clients(g, companies)
+		sweep = Sweep(runSweepTask, workers, store)
+		base_seed = s.replicateSeed()
 		range_per_edge_exp = list(np.array(list(range(0,500,10)))/1000)
 		for per_exp in range_per_edge_exp:	
 			if self.edge:
 				s.p_edge_explosion = per_exp
 			else:
 				s.p_truck_explosion = per_exp	
-			if self.edge:
-				money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
-			else:
-				money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients, truckExp=True)
+			sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests, params=dict(edge=self.edge, p_explosion=float(per_exp)))
+		values_per_exp = []
+		for results in sweep.run():
+			money_per_company = s.reduceTests(results)[0]
 			maximum = [i[-1] for i in money_per_company]
 			values_per_exp.append(money_per_company[maximum.index(max(maximum))][-1])
-			gc.collect()
+		gc.collect()
 		legend = [["Company w/ most profit"]]
 		if self.edge:
-			s.drawPlot(range_per_edge_exp, values_per_exp, "Edge Explosion", "% Edge Explosion", "Money", legend, per=0.05)
+			s.drawPlot(range_per_edge_exp, values_per_exp, "Edge Explosion", "% Edge Explosion", "Money", legend, per=0.05, output=self.output)
 		else:
-			s.drawPlot(range_per_edge_exp, values_per_exp, "Truck Explosion", "% Truck Explosion", "Money", legend, per=0.05)
+			s.drawPlot(range_per_edge_exp, values_per_exp, "Truck Explosion", "% Truck Explosion", "Money", legend, per=0.05, output=self.output)
 
 class TruckExplosion(Explosion):
 	def __init__(self, graphType):
@@ -395,26 +613,30 @@ class EdgeExplosion(Explosion):
 
 class ProfitMargin(SimulationObject):
 	def run(self):
-		s = Simulation(graph_type=self.type, graph_param=self.graph_param)
+		s = self.simulation()
 		g = s.build_graph()
 		companies = s.generate_companies(g)
-		graph_utils.draw_graph(g)
+		self.drawGraph(g)
 		s.generate_trucks(g, companies)
-		cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
-		clients = s.generate_clients(g, cpy_companies)
-		money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
+		clients = s.generate_clients(g, companies)
+		# the sweep caches the baseline, it is the point with the default margin
+		sweep = Sweep(runSweepTask, workers, store)
+		base_seed = s.replicateSeed()
+		sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests)
+		money_per_company = s.reduceTests(sweep.run()[0])[0]
 		minimum = [m[-1] for m in money_per_company]
 		index_company = minimum.index(min(minimum))
 		# values for index_company for different values of profit margin
-		values_pm_company = []
-		profitMaring_values = list(np.array(list(range(10,50,1)))/10)		
+		profitMaring_values = [pm/10 for pm in range(10,50,1)]
 		for pm in profitMaring_values:
 			companies[index_company][1].setProfitMargin(pm)
-			money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
-			values_pm_company.append(money_per_company[index_company][-1])
-			gc.collect()
+			sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests, params=dict(company=index_company, profit_margin=pm))
+		values_pm_company = []
+		for results in sweep.run():
+			values_pm_company.append(s.reduceTests(results)[0][index_company][-1])
+		gc.collect()
 		legend = [["Company w/ worst profit: "+str(companies[index_company][1].pos)]]
-		s.drawPlot(profitMaring_values, values_pm_company, "Profit Margin", "Profit Margin", "Money", legend, per=0.05, color=graph_utils.colormap[companies[index_company][0]])
+		s.drawPlot(profitMaring_values, values_pm_company, "Profit Margin", "Profit Margin", "Money", legend, per=0.05, color=graph_utils.colormap[companies[index_company][0]], output=self.output)
 
 class Preferences(SimulationObject):
 	def __init__(self, graphType, legend, last=False):
@@ -423,32 +645,34 @@ class Preferences(SimulationObject):
 		self.legend = legend
 
 	def drawPlot(self, pref_values, second_company, best_company, title, xlabel, ylabel, legend, color):
-		plt.figure()
-		plt.title(title)
-		plt.xlabel(xlabel)
-		plt.ylabel(ylabel)
-		sec_error = 0.05 * np.array(second_company)
-		best_error = 0.05 * np.array(best_company)
-		plt.errorbar(pref_values, second_company, yerr=sec_error, label=legend[0], color=color[0])
-		plt.errorbar(pref_values, best_company, yerr=best_error, label=legend[1], color=color[1])
-		plt.legend()
-		plt.show()
+		sec_error = 0.05 * np.abs(np.array(second_company))
+		best_error = 0.05 * np.abs(np.array(best_company))
+		curves = [render.series(pref_values, second_company, sec_error, label=legend[0], color=color[0]),
+			render.series(pref_values, best_company, best_error, label=legend[1], color=color[1])]
+		render.submit(render.plot(title, xlabel, ylabel, curves, data=dict(x=pref_values, second_company=second_company, best_company=best_company, legend=legend)), self.output)
 
 	def run(self):
-		s = Simulation(graph_type=self.type, graph_param=self.graph_param)
+		s = self.simulation()
 		g = s.build_graph()
-		while not nx.is_connected(g):
+		while not graph_utils.is_connected(g):
 			g = s.build_graph()
 		companies = s.generate_companies(g)
 		s.generate_trucks(g, companies)
-		graph_utils.draw_graph(g)
-		cpy_companies = [(c[0], copy.deepcopy(c[1])) for c in companies]
-		clients = s.generate_clients(g, cpy_companies)
+		self.drawGraph(g)
+		clients = s.generate_clients(g, companies)
 		basic_preferences = [1/s.n_companies for _ in range(s.n_companies)]
-		for cli in clients:
-			cli.setUtilities(basic_preferences)
-			cli.risk=1
-		money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
+		if isinstance(clients, Demand):
+			clients.setUtilities(basic_preferences)
+			clients.risk[:] = 1
+		else:
+			for cli in clients:
+				cli.setUtilities(basic_preferences)
+				cli.risk=1
+		# the sweep caches the baseline, it is the point with 1/n_companies
+		sweep = Sweep(runSweepTask, workers, store)
+		base_seed = s.replicateSeed()
+		sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests)
+		money_per_company = s.reduceTests(sweep.run()[0])[0]
 		if not self.last:
 			maximum = [m[-1] for m in money_per_company]
 			index_best_company = maximum.index(max(maximum))
@@ -458,17 +682,22 @@ class Preferences(SimulationObject):
 			minimum = [m[-1] for m in money_per_company]
 			index_company = minimum.index(min(minimum))
 		# values for index_company for different values of preferences
+		preferences_values = [pref/100 for pref in range(20,101,1)]
+		for pref in preferences_values:
+			if isinstance(clients, Demand):
+				clients.utilities[:, index_company] = pref
+			else:
+				for cli in clients:
+					cli.utilities[index_company]=pref
+			sweep.add(s.sweepPoint(base_seed, g, companies, clients), tests, params=dict(company=index_company, preference=pref))
 		values_company_preferences = []
 		values_best_company = []
-		preferences_values = list(np.array(list(range(20,101,1)))/100)
-		for pref in preferences_values:
-			for cli in clients:
-				cli.utilities[index_company]=pref
-			money_per_company = s.testCicle(g, s.generateMoneyPerCompany(), companies, cpy_companies, clients)
+		for results in sweep.run():
+			money_per_company = s.reduceTests(results)[0]
 			values_company_preferences.append(money_per_company[index_company][-1])
 			if not self.last:
 				values_best_company.append(money_per_company[index_best_company][-1])
-			gc.collect()
+		gc.collect()
 		
 		if not self.last:
 			self.legend[0] = self.legend[0] + str(companies[index_company][1].pos)
@@ -476,7 +705,7 @@ class Preferences(SimulationObject):
 			self.drawPlot(preferences_values, values_company_preferences, values_best_company, "Preferences", "Preferences (%)", "Money", self.legend, color=[graph_utils.colormap[companies[index_company][0]], graph_utils.colormap[companies[index_best_company][0]]])
 		else:
 			self.legend[0] = [self.legend[0][0] + str(companies[index_company][1].pos)]
-			s.drawPlot(preferences_values, values_company_preferences, "Preferences", "Preferences (%)", "Money", self.legend, per=0.05, color=graph_utils.colormap[companies[index_company][0]])
+			s.drawPlot(preferences_values, values_company_preferences, "Preferences", "Preferences (%)", "Money", self.legend, per=0.05, color=graph_utils.colormap[companies[index_company][0]], output=self.output)
 
 class LastPreferences(Preferences):
 	def __init__(self, graphType):
@@ -579,11 +808,23 @@ class Menu(object):
 			except Exception as e:
 				print("\nPlease enter a valid integer\n")
 
+	def changeWorkers(self):
+		global workers
+		while True:
+			try:
+				print(f"\nCurrent number of worker processes: {workers} (0 uses every core)")
+				num_workers = int(input("New number:  "))
+				workers = num_workers if num_workers >= 0 else workers
+				return
+			except Exception as e:
+				print("\nPlease enter a valid integer\n")
+
 	def defaultValues(self):
-		global graphType, tests, iterations, verbosity, verbosity_events, verbosity_companies
+		global graphType, tests, iterations, workers, verbosity, verbosity_events, verbosity_companies
 		graphType = "random"
 		tests = 30
 		iterations = 100
+		workers = 1
 		verbosity = False
 		verbosity_events = False 
 		verbosity_companies = False
@@ -598,6 +839,7 @@ class Menu(object):
 			print("4 - Change number of tests per simulation")
 			print("5 - Restore default values")
 			print("6 - None")
+			print("7 - Change number of worker processes")
 			print("0 - Terminate\n")
 			try:
 				option = int(input("Option:  "))
@@ -623,6 +865,9 @@ class Menu(object):
 				return
 			elif option == 6:
 				return
+			elif option == 7:
+				self.changeWorkers()
+				return
 			elif option == 0:
 				simulating = False
 				return
@@ -741,6 +986,15 @@ graphType = "random"
 tests = 30
 # initial number os iterations per test
 iterations = 100
+# processes running the tests of a simulation (0 - one per core)
+workers = 1
+# a results.ResultStore keeping the tests' results on disk, None keeps them in RAM
+store = None
+# folder of the tests' checkpoints (tick engine), None takes none, and the ticks between them
+checkpoints = None
+checkpointEvery = 1000
+# id(graph) -> (graph, sweep.Shared of its distance tables), the last graph a sweep point was made on
+graphTables = dict()
 # verbosity levels
 verbosity = False
 verbosity_events = False 
@@ -748,7 +1002,8 @@ verbosity_companies = False
 # simulation flag
 simulating = True
 
-menu = Menu()
-menu.start()
+if __name__ == '__main__':
+	menu = Menu()
+	menu.start()
 
 
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+import glob
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from random import getstate, setstate
+
+def sources():
+	# digest of the simulation's sources, part of every point's digest so that
+	# results stored by other code are never taken for this code's
+	code = hashlib.sha1()
+	for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+		with open(path, "rb") as f:
+			code.update(f.read())
+	return code.digest()
+
+CODE = sources()
+
+payloads = dict() # digest -> payload of the points of the sweep this process runs
+labelled = dict() # digest -> sweep parameters of those points
+folder = None # where worker processes read the payloads from, see share
+loaded = dict() # digest -> unpickled point, the last one of this process
+unshared = dict() # key -> value of a Shared, the last one of this process
+
+class Shared(object):
+	# a value held by many points of a sweep (the distance tables of their
+	# graph): pickled once per sweep, not with every point, see Sweep.add
+	def __init__(self, value):
+		self.value = value
+
+def readPayload(key):
+	if key in payloads:
+		return payloads[key]
+	with open(os.path.join(folder, key), "rb") as f:
+		return f.read()
+
+def loadShared(key):
+	# persistent_load of the points: a Shared comes back as its bare value
+	if key not in unshared:
+		unshared.clear()
+		unshared[key] = pickle.loads(readPayload(key))
+	return unshared[key]
+
+def share(path, labels):
+	# worker initializer: the payloads are files named by digest in path
+	global folder
+	folder = path
+	labelled.update(labels)
+
+def loadPoint(digest):
+	# (point, sweep parameters) of a task, the point unpickled once per process;
+	# its tests restore it before running, see simulation.runSweepTask
+	if digest not in loaded:
+		loaded.clear()
+		unpickler = pickle.Unpickler(io.BytesIO(readPayload(digest)))
+		unpickler.persistent_load = loadShared
+		loaded[digest] = unpickler.load()
+	return (loaded[digest], labelled.get(digest) or dict())
+
+class Sweep(object):
+	# runs every (sweep point, test) pair of an experiment as a single pool of
+	# tasks; idle workers take the next pending task, so a slow point never
+	# leaves the other workers waiting
+	def __init__(self, function, workers=1, store=None):
+		self.function = function # module level, called with (payload digest, test), see loadPoint
+		self.workers = workers if workers > 0 else os.cpu_count()
+		self.store = store # a results.ResultStore: results go to disk as they come, not to the cache
+		self.points = []
+		self.shared = dict() # id(Shared) -> (key, Shared) of the values the points hold
+		self.blobs = dict() # key -> pickled value of a Shared
+		self.cache = {} # (payload digest, test) -> result
+
+	def __repr__(self):
+		return f"Sweep with {len(self.points)} points and {self.workers} workers"
+
+	def add(self, point, tests, cost=1, params=None):
+		# the point is pickled right away, so changing its objects afterwards
+		# (the next sweep value) does not affect it; params - the sweep values
+		# of the point, kept in the store's index
+		buffer = io.BytesIO()
+		pickler = pickle.Pickler(buffer)
+		pickler.persistent_id = self.share
+		pickler.dump(point)
+		payload = buffer.getvalue()
+		self.points.append((payload, hashlib.sha1(CODE + payload).hexdigest(), tests, cost, params))
+
+	def share(self, obj):
+		# persistent_id of the points: a Shared is pickled once, under the digest
+		# of its pickle, which then stands for it in the payloads (and their digests)
+		if not isinstance(obj, Shared):
+			return None
+		if id(obj) not in self.shared:
+			blob = pickle.dumps(obj.value)
+			key = hashlib.sha1(blob).hexdigest()
+			self.blobs[key] = blob
+			self.shared[id(obj)] = (key, obj)
+		return self.shared[id(obj)][0]
+
+	def done(self, digest, i):
+		return (digest, i) in self.cache or (self.store is not None and self.store.has(digest, i))
+
+	def tasks(self):
+		# pending tasks, most expensive points first; points already computed
+		# (same payload and test) are served from the cache or the store
+		tasks = dict()
+		for payload, digest, tests, cost, params in self.points:
+			for i in range(tests):
+				if not self.done(digest, i):
+					tasks[digest, i] = (cost, payload, params)
+		return sorted(tasks.items(), key=lambda t: -t[1][0])
+
+	def collect(self, tasks, results):
+		for ((digest, i), (cost, payload, params)), result in zip(tasks, results):
+			if self.store is not None:
+				self.store.append(digest, i, result, params)
+			else:
+				self.cache[digest, i] = result
+
+	def run(self):
+		# returns, per point and in order, the results of its tests: a list, or
+		# a (tests, ...) array read from the store
+		tasks = self.tasks()
+		args = [(digest, i) for (digest, i), (cost, payload, params) in tasks]
+		pending = dict((digest, payload) for (digest, i), (cost, payload, params) in tasks)
+		pending.update(self.blobs)
+		labels = dict((digest, params) for (digest, i), (cost, payload, params) in tasks)
+		if self.workers > 1 and len(args) > 1:
+			# each point goes to the workers once, as a file, not with each of its tests
+			with tempfile.TemporaryDirectory() as path:
+				for digest, payload in pending.items():
+					with open(os.path.join(path, digest), "wb") as f:
+						f.write(payload)
+				with ProcessPoolExecutor(max_workers=min(self.workers, len(args)), initializer=share, initargs=(path, labels)) as executor:
+					self.collect(tasks, executor.map(self.function, args))
+		else:
+			state = getstate()
+			payloads.update(pending)
+			labelled.update(labels)
+			try:
+				self.collect(tasks, map(self.function, args))
+			finally:
+				payloads.clear()
+				labelled.clear()
+				loaded.clear()
+				unshared.clear()
+			setstate(state)
+		if self.store is not None:
+			curves = [self.store.block(digest, tests) for payload, digest, tests, cost, params in self.points]
+		else:
+			curves = [[self.cache[digest, i] for i in range(tests)] for payload, digest, tests, cost, params in self.points]
+		self.points = []
+		self.shared.clear()
+		self.blobs.clear()
+		return curves
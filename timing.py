@@ -0,0 +1,54 @@
+#!/usr/bin/python
+import json
+import time
+import numpy as np
+
+# phases of a tick, see Simulation.run and EventEngine.run
+EVENTS = 0 # edge and truck explosions
+MARKET = 1 # clients' offers, bids and awards
+GAME_OVER = 2 # bankrupt companies leaving, removeCompany on every client
+COMPANIES = 3 # Company.go: trucks moving and offers put on trucks
+PHASES = ["events", "market", "game_over", "companies"]
+
+class PhaseTimer(object):
+	# nanoseconds spent in each phase of each tick; mark(phase) charges the
+	# time since the previous mark (or since tick) to phase. Simulation.run only
+	# calls it when profiling, otherwise there is no timer at all
+	def __init__(self, iterations, phases=PHASES):
+		self.phases = phases
+		self.ns = np.zeros((iterations, len(phases)), dtype=np.int64)
+		self.row = 0
+		self.last = time.perf_counter_ns()
+
+	def __repr__(self):
+		return f"PhaseTimer over {len(self.ns)} ticks"
+
+	def tick(self, i):
+		self.row = i
+		self.last = time.perf_counter_ns()
+
+	def mark(self, phase):
+		now = time.perf_counter_ns()
+		self.ns[self.row, phase] += now - self.last
+		self.last = now
+
+	def report(self):
+		# totals and per tick figures of each phase, in nanoseconds
+		ticks = self.ns.sum(axis=1)
+		total = self.ns.sum(axis=0)
+		return dict(phases=self.phases, ticks=len(self.ns), total_ns=total.tolist(),
+			share=(total/max(total.sum(), 1)).tolist(),
+			mean_tick_ns=self.ns.mean(axis=0).tolist(), max_tick_ns=self.ns.max(axis=0).tolist(),
+			slowest_tick=int(ticks.argmax()) if len(ticks) else None)
+
+	def format(self):
+		report = self.report()
+		lines = [f"{'phase':12} {'total ms':>10} {'share':>7} {'mean us/tick':>13} {'max us/tick':>12}"]
+		for k, phase in enumerate(self.phases):
+			lines.append(f"{phase:12} {report['total_ns'][k]/1e6:10.2f} {report['share'][k]:7.1%} {report['mean_tick_ns'][k]/1e3:13.1f} {report['max_tick_ns'][k]/1e3:12.1f}")
+		return "\n".join(lines)
+
+	def write(self, path, **info):
+		# one json line per run, appended, so that the runs of a sweep share a file
+		with open(path, "a") as f:
+			f.write(json.dumps(dict(info, **self.report())) + "\n")
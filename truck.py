@@ -1,9 +1,9 @@
 #!/usr/bin/python
 import networkx as nx
-from company import *
-from offer import *
-from itertools import tee
+from distance_oracle import nearest_target
+from fleet import TruckFleet
 import math
+import metrics
 
 map_status = ["ocupado", "livre"]
 # status
@@ -13,18 +13,62 @@ map_status = ["ocupado", "livre"]
 class Truck:
 	def __init__(self, id, owner, g, capacity = 300):
 		self.id = id
-		self.pos = owner.pos
 		self.owner = owner
-		self.status = 1
-		self.items = []
-		self.totalCapacity = capacity
-		self.capacity = 0
-		self.totalValue = 0
+		# a truck's state lives in a fleet slot; it has a fleet of its own
+		# until Company.setTrucks moves it into the company's fleet
+		self.fleet = TruckFleet(1, owner.pos, capacity)
+		self.slot = 0
+		self.fleet.trucks[0] = self
+		self.items = dict() # target -> item with the total quantity and value for it
+		self.plan = [] # targets in the order the truck will visit them
+		self.stop = 0 # index in plan of the stop the truck heads for, see get_next_node_in_path
+		self.planned = None # oracle version the plan was ordered with, see replan
 		self.graph = g
+		self.oracle = None
 
 	def __repr__(self):
 		return f"Truck {self.id} from company {self.owner} with {len(self.items)} items, with total value {self.totalValue}"
 
+	@property
+	def pos(self):
+		return int(self.fleet.pos[self.slot])
+
+	@pos.setter
+	def pos(self, pos):
+		self.fleet.pos[self.slot] = pos
+
+	@property
+	def status(self):
+		return int(self.fleet.status[self.slot])
+
+	@status.setter
+	def status(self, status):
+		self.fleet.setStatus(self.slot, status)
+
+	@property
+	def capacity(self): # capacidade ocupada
+		return self.fleet.capacity[self.slot]
+
+	@capacity.setter
+	def capacity(self, capacity):
+		self.fleet.capacity[self.slot] = capacity
+
+	@property
+	def totalCapacity(self):
+		return self.fleet.totalCapacity[self.slot]
+
+	@totalCapacity.setter
+	def totalCapacity(self, capacity):
+		self.fleet.totalCapacity[self.slot] = capacity
+
+	@property
+	def totalValue(self):
+		return self.fleet.totalValue[self.slot]
+
+	@totalValue.setter
+	def totalValue(self, value):
+		self.fleet.totalValue[self.slot] = value
+
 	def getStatus(self):
 		return map_status[self.status]
 
@@ -40,75 +84,138 @@ class Truck:
 	def updateGraph(self, g):
 		self.graph = g
 
+	def updateOracle(self, oracle):
+		self.oracle = oracle
+		self.planned = None
+
 	def addItem(self, item): # atribuir um pedido a um camiao
-		for curr_item in self.items:
-			if curr_item.target == item.target:
-				curr_item.value += item.value
-				self.totalValue += item.value
-				self.capacity += item.getQuantity()
-				return
-		self.items.append(item)
+		curr_item = self.items.get(item.target)
+		if curr_item is not None:
+			curr_item.value += item.value
+			curr_item.quantity += item.getQuantity()
+			self.totalValue += item.value
+			self.capacity += item.getQuantity()
+			return
+		self.items[item.target] = item
 		self.totalValue += item.getValue()
 		self.capacity += item.getQuantity()
+		if self.oracle is not None:
+			self.replan()
+			self.plan.insert(self.insertion(item.target)[1], item.target)
+		else:
+			self.plan.append(item.target)
+		self.fleet.updateStops(self.slot)
 		# print(f"item added to truck: {len(self.items)}")
 
 	def go(self, g):
+		# moves one hop, returns the weight of the edge travelled (None if it did not move)
 		# atualizar grafo
 		self.updateGraph(g)
 
 		if self.getStatus() == "livre":
-			return		
-
-		for item in self.items:
-			if self.pos == item.getTarget():
-				# print("deliver item to client")
-				self.items.remove(item)
-				# print(self.items)
-				if self.items == []:
-					# print(f"no more items. teleport to {self.owner}")
-					self.finalStep(1)
-					return
-
-		# 1. Get next position to move truck
-		try:
-			next_node = self.get_next_node_in_path()
-		except Exception as e:
-			self.finalStep(-1)
-			return
+			return None
+
+		# 1. Get next position to move truck, delivering first when the truck
+		# is at the stop it heads for (stops are served in the order of the plan)
+		while True:
+			try:
+				cost, next, target = self.get_next_node_in_path()
+			except Exception as e:
+				self.finalStep(-1)
+				return None
+			if target != self.pos:
+				break
+			# print("deliver item to client")
+			del self.items[target]
+			self.plan.pop(self.stop)
+			# print(self.items)
+			if not self.items:
+				# print(f"no more items. teleport to {self.owner}")
+				self.finalStep(1)
+				return None
 		
 		# 2. Move truck and update profit
-		next = next_node[1][1]
-		self.totalValue -= self.graph[self.pos][next]["weight"]
+		weight = self.graph[self.pos][next]["weight"]
+		self.totalValue -= weight
 		self.pos = next
+		return weight
 		# calcular preco da viagem
 		# notificar
 
 	def get_next_node_in_path(self):
-		def pairwise(iterable):
-			a, b = tee(iterable)
-			next(b, None)
-			return zip(a, b)
-
-		all_sps = [(item, nx.shortest_path(self.graph, self.pos, item.target)) for item in self.items]
-		all_sps_costs = [(sum([self.graph[u][v]["weight"] for (u,v) in pairwise(sp)]), sp, item) for (item, sp) in all_sps]
-		# print(all_sps_costs)
-		return min(all_sps_costs, key=lambda x: x[0])
+		# returns (cost, next hop, target) towards the next stop of the plan that
+		# can still be reached, or the closest item's target without an oracle
+		metrics.counters["route_lookups"] += 1
+		targets = list(self.items)
+		if self.oracle is not None:
+			self.replan()
+			for k, target in enumerate(self.plan):
+				cost = self.oracle.distance(self.pos, target)
+				if cost != math.inf:
+					self.stop = k
+					return (cost, self.oracle.next_hop(self.pos, target), target)
+			raise nx.NetworkXNoPath(f"no path from {self.pos} to {targets}")
+		cost, target, next = nearest_target(self.graph, self.pos, targets)
+		if cost == math.inf:
+			raise nx.NetworkXNoPath(f"no path from {self.pos} to {targets}")
+		self.stop = self.plan.index(target)
+		return (cost, next, target)
+
+	def replan(self):
+		# after a repair changed the distances between the stops of the plan, they
+		# are inserted again one by one, from where the truck is
+		if self.planned == self.oracle.version:
+			return
+		rows = self.oracle.changedSince(self.planned)
+		self.planned = self.oracle.version
+		if not self.plan or (rows is not None and rows.isdisjoint(self.plan)):
+			return
+		metrics.counters["trucks_replanned"] += 1
+		stops, self.plan = self.plan, []
+		for target in stops:
+			self.plan.insert(self.insertion(target, self.pos)[1], target)
+		self.fleet.updateStops(self.slot)
+
+	def insertion(self, target, start=None):
+		# (cost, index) of the cheapest place for target in the plan: after the
+		# last stop or between two consecutive stops, the first being start (the
+		# depot by default)
+		dist = self.oracle.dist
+		stops = [self.owner.pos if start is None else start] + self.plan
+		best, at = dist[stops[-1], target], len(self.plan)
+		for i in range(len(self.plan)):
+			a, b = stops[i], stops[i+1]
+			if dist[a, b] != math.inf:
+				cost = dist[a, target] + dist[target, b] - dist[a, b]
+				if cost < best:
+					best, at = cost, i
+		return (best, at)
 
 	def finalStep(self, signal):
+		if signal < 0:
+			metrics.counters["trucks_failed"] += 1
 		self.pos = self.owner.pos
 		self.owner.money = self.owner.money + signal*self.totalValue
 		self.totalValue = 0
 		self.capacity = 0
+		# a failed truck drops what it had left, its reach is the depot's again
+		self.items = dict()
+		self.plan = []
+		self.stop = 0
+		self.planned = None
 		self.setStatus("livre")
+		self.fleet.updateStops(self.slot)
 		# print(f"updated company: {self.owner}")
 
 	def getPrice(self, item): # devolver o melhor custo se adicionar o item ao truck
 		if self.getCapacity() < item.getQuantity() or self.getStatus() == "ocupado":
 			return math.inf
+		if self.oracle is not None:
+			return self.insertion(item.getTarget())[0]
 		costs = []
 		try:
 			costs.append(self.graph[self.owner.pos][item.getTarget()]["weight"])
-			for j in self.items:
+			for j in self.items.values():
 				costs_list = [nx.shortest_path(self.graph,source=j.getTarget(),target=item.getTarget())]
 				# print(costs_list)
 				for i in range(len(costs_list)):